@@ -1,48 +1,46 @@
 from ortools.sat.python import cp_model
+import argparse
 import sys
-import psutil
 import os
-import csv
-import glob
+import json
 import time
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.truck_types import group_trucks, truck_copies
+from common.benchmark import add_benchmark_arguments, input_files, run_benchmark
+from common.cp_params import ObjectiveTrace, configure_solver
+from common.loader import load
+from common.lower_bounds import gap, lower_bound
+from common.model_cache import CACHE_DIR
+from common.presolve import common_scale
+from common.resources import ResourceLog, phase_columns
+from common.warm_start import HINT_SHARE, heuristic_start
+from CP_model_1 import MODELS, add_warm_start, build_or_load, model_size
+
+# Các giai đoạn được đo thời gian (wall, CPU) và bộ nhớ đỉnh riêng (common.resources)
+PHASES = ['parse', 'build', 'bound', 'solve', 'output']
+
 def input_data(file_path):
-    """Đọc dữ liệu đầu vào từ file."""
-    data = {}
+    """Đọc dữ liệu đầu vào từ file (dùng file .npy đi kèm nếu có, xem common.loader)."""
     try:
-        with open(file_path, 'r') as f:
-            # Đọc số lượng vật phẩm (n) và hộp (k)
-            n, k = map(int, f.readline().split())
-            data['size_item'] = []
-            data['size_truck'] = []
-            data['cost'] = []
-
-            # Đọc kích thước các vật phẩm
-            for _ in range(n):
-                w, l = map(int, f.readline().split())
-                data['size_item'].append([w, l])
-
-            # Đọc kích thước và chi phí các hộp
-            for _ in range(k):
-                w, l, c = map(int, f.readline().split())
-                data['size_truck'].append([w, l])
-                data['cost'].append(c)
-
-        W_truck = [data['size_truck'][i][0] for i in range(k)]
-        H_truck = [data['size_truck'][i][1] for i in range(k)]
-        return n, k, data, W_truck, H_truck
+        return load(file_path).to_data()
     except Exception as e:
         print(f"Lỗi khi đọc file {file_path}: {e}")
         return None
 
-def solve_bin_packing(file_path, time_limit=300):
-    """Giải bài toán đóng gói hộp cho một file đầu vào."""
-    process = psutil.Process(os.getpid())
-    mem_before = process.memory_info().rss / 1024 / 1024  # Bộ nhớ trước, tính bằng MB
+def solve_bin_packing(file_path, time_limit=300, formulation='bigm', warm_start=True, presolve=True, options=None,
+                      cache_dir=None):
+    """Giải bài toán đóng gói hộp cho một file đầu vào với mô hình formulation (xem CP_model_1.MODELS).
+    options: tùy chọn CP-SAT (số worker, chiến lược tìm kiếm, ...) của common.cp_params.configure_solver.
+    Nếu warm_start, lời giải heuristic được dùng làm gợi ý (hint) và cận trên của chi phí.
+    Nếu presolve, kích thước được chia cho ước chung và các biến không cần thiết bị loại (common.presolve).
+    Nếu có cache_dir, mô hình đã tạo trước đó cho cùng dữ liệu được nạp lại thay vì tạo mới (common.model_cache)."""
+    log = ResourceLog()  # Thời gian và bộ nhớ đỉnh của từng giai đoạn
     start_time = time.time()  # Thời gian bắt đầu
 
     # Đọc dữ liệu
-    result = input_data(file_path)
+    with log.phase('parse'):
+        result = input_data(file_path)
     if result is None:
         return {
             'file_name': os.path.basename(file_path),
@@ -50,91 +48,63 @@ def solve_bin_packing(file_path, time_limit=300):
             'k': -1,
             'cost': -1,
             'running_time': 0,
-            'mem_cost': 0
+            'mem_cost': 0,
+            'model': formulation,
+            'build_time': 0,
+            'load_time': 0,
+            'n_variables': 0,
+            'n_constraints': 0,
+            'warm_start_cost': -1,
+            'removed_variables': 0,
+            'removed_constraints': 0,
+            'workers': (options or {}).get('workers', 0),
+            'time_to_best': -1,
+            'curve': '[]',
+            'lower_bound': -1,
+            'gap': -1
         }
 
     n, k, data, W_truck, H_truck = result
-    max_W = max(W_truck)
-    max_H = max(H_truck)
-
-    # Tạo mô hình CP
-    model = cp_model.CpModel()
-
-    # Hằng số big-M
-    M = 1000000
-
-    # Biến
-    x = {}  # x[(i,m)] = 1 nếu vật phẩm i được đặt trong hộp m
-    Ro = {}  # Ro[i] = 1 nếu vật phẩm i được xoay 90 độ
-    l = {}  # Tọa độ trái
-    r = {}  # Tọa độ phải
-    t = {}  # Tọa độ trên
-    b = {}  # Tọa độ dưới
-
-    for i in range(n):
-        Ro[i] = model.NewBoolVar(f'Ro[{i}]')
-        l[i] = model.NewIntVar(0, max_W, f'l[{i}]')
-        r[i] = model.NewIntVar(0, max_W, f'r[{i}]')
-        t[i] = model.NewIntVar(0, max_H, f't[{i}]')
-        b[i] = model.NewIntVar(0, max_H, f'b[{i}]')
-
-        # Ràng buộc tọa độ dựa trên xoay
-        model.Add(r[i] == l[i] + (1 - Ro[i]) * data['size_item'][i][0] + Ro[i] * data['size_item'][i][1])
-        model.Add(t[i] == b[i] + (1 - Ro[i]) * data['size_item'][i][1] + Ro[i] * data['size_item'][i][0])
-
-        for m in range(k):
-            x[(i, m)] = model.NewBoolVar(f'x_[{i}]_[{m}]')
-            # Vật phẩm không được vượt quá kích thước hộp
-            model.Add(r[i] <= (1 - x[(i, m)]) * M + W_truck[m])
-            model.Add(l[i] <= (1 - x[(i, m)]) * M + W_truck[m])
-            model.Add(t[i] <= (1 - x[(i, m)]) * M + H_truck[m])
-            model.Add(b[i] <= (1 - x[(i, m)]) * M + H_truck[m])
-
-    # Mỗi vật phẩm chỉ được đặt trong một hộp
-    for i in range(n):
-        model.Add(sum(x[(i, m)] for m in range(k)) == 1)
-
-    # Ràng buộc không chồng lấn
-    for i in range(n - 1):
-        for j in range(i + 1, n):
-            for m in range(k):
-                e = model.NewBoolVar(f'e[{i}][{j}]')
-                model.Add(e >= x[(i, m)] + x[(j, m)] - 1)
-                model.Add(e <= x[(i, m)])
-                model.Add(e <= x[(j, m)])
-                c1 = model.NewBoolVar(f'c1[{i}][{j}]')
-                c2 = model.NewBoolVar(f'c2[{i}][{j}]')
-                c3 = model.NewBoolVar(f'c3[{i}][{j}]')
-                c4 = model.NewBoolVar(f'c4[{i}][{j}]')
-                model.Add(r[i] <= l[j] + M * (1 - c1))
-                model.Add(r[j] <= l[i] + M * (1 - c2))
-                model.Add(t[i] <= b[j] + M * (1 - c3))
-                model.Add(t[j] <= b[i] + M * (1 - c4))
-                model.Add(c1 + c2 + c3 + c4 + (1 - e) * M >= 1)
-                model.Add(c1 + c2 + c3 + c4 <= e * M)
-
-    # Xác định hộp được sử dụng
-    z = {}
-    for m in range(k):
-        z[m] = model.NewBoolVar(f'z[{m}]')
-        q = model.NewIntVar(0, n, f'q[{m}]')
-        model.Add(q == sum(x[(i, m)] for i in range(n)))
-        model.Add(z[m] <= q * M)
-        model.Add(q <= z[m] * M)
-
-    # Hàm mục tiêu: Tối thiểu hóa chi phí
-    cost = sum(z[m] * data['cost'][m] for m in range(k))
-    model.Minimize(cost)
+
+    with log.phase('build'):
+        # Gộp các xe giống nhau thành loại; mỗi loại không cần quá n xe
+        copies = truck_copies(group_trucks(zip(W_truck, H_truck, data['cost'])), n)
+        truck_id = [copy[0] for copy in copies]
+        trucks = [copy[1:] for copy in copies]
+        data['cost'] = [copy[3] for copy in copies]
+        n_copies = len(copies)
+
+        # Tạo mô hình CP (kể cả bước presolve), hoặc nạp lại từ cache_dir
+        scale = 1
+        if presolve:
+            # Chia kích thước cho ước chung lớn nhất; tọa độ được nhân lại khi in kết quả
+            scale = common_scale(data['size_item'], trucks)
+            data['size_item'] = [[w // scale, h // scale] for w, h in data['size_item']]
+            trucks = [(W // scale, H // scale, C) for W, H, C in trucks]
+        model, (x, Ro, l, b, z), counters, build_time, load_time = build_or_load(
+            formulation, n, data, trucks, presolve, cache_dir)
+        n_variables, n_constraints = model_size(model)
+
+        # Khởi động từ lời giải heuristic trên cùng danh sách xe
+        start = heuristic_start(data['size_item'], trucks) if warm_start else None
+        hint_time = 0
+        if start is not None:
+            hint_time = add_warm_start(model, start, data, x, Ro, l, b, z, HINT_SHARE * time_limit)
+
+    # Cận dưới: dừng sớm khi chi phí nằm trong khoảng gap_limit so với cận dưới
+    with log.phase('bound'):
+        bound = lower_bound(data['size_item'], trucks)
 
     # Tạo solver và giải
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = time_limit
-    status = solver.Solve(model)
+    with log.phase('solve'):
+        # Thời gian hoàn thiện gợi ý được trừ vào giới hạn thời gian
+        solver = configure_solver(cp_model.CpSolver(), max(0, time_limit - hint_time), **(options or {}))
+        trace = ObjectiveTrace(lower_bound=bound, gap_limit=(options or {}).get('gap_limit', 0))
+        status = solver.Solve(model, trace)
 
-    # Tính thời gian chạy và bộ nhớ tiêu thụ
+    # Tính thời gian chạy và bộ nhớ tiêu thụ (bộ nhớ đỉnh so với lúc bắt đầu, không âm)
     running_time = time.time() - start_time
-    mem_after = process.memory_info().rss / 1024 / 1024
-    mem_cost = mem_after - mem_before
+    mem_cost = log.mem_cost
 
     # Chuẩn bị kết quả
     result = {
@@ -143,56 +113,102 @@ def solve_bin_packing(file_path, time_limit=300):
         'k': k,
         'cost': -1,
         'running_time': running_time,
-        'mem_cost': mem_cost
+        'mem_cost': mem_cost,
+        'model': formulation,
+        'build_time': build_time,
+        'load_time': load_time,
+        'n_variables': n_variables,
+        'n_constraints': n_constraints,
+        'warm_start_cost': start.cost if start is not None else -1,
+        'removed_variables': counters['removed_variables'] if counters is not None else 0,
+        'removed_constraints': counters['removed_constraints'] if counters is not None else 0,
+        'workers': (options or {}).get('workers', 0),
+        'time_to_best': trace.time_to_best if trace.time_to_best is not None else -1,
+        # Chi phí theo thời gian: [[thời gian, chi phí], ...] của các lời giải cải thiện
+        'curve': json.dumps([[round(wall_time, 3), cost] for wall_time, cost in trace.curve]),
+        'lower_bound': bound,
+        'gap': -1
     }
 
     # Xử lý kết quả
-    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-        result['cost'] = solver.ObjectiveValue()
-        print('--------------Solution Found--------------')
-        for i in range(n):
-            truck = None
-            for m in range(k):
-                if solver.Value(x[(i, m)]) == 1:
-                    truck = m + 1
-                    break
-            print(f"{i + 1} {truck} {solver.Value(l[i])} {solver.Value(b[i])} {int(solver.Value(Ro[i]))}")
-        print('----------------Statistics----------------')
-        print('Status              :', 'OPTIMAL' if status == cp_model.OPTIMAL else 'FEASIBLE')
-        print(f'Time limit          : {time_limit}')
-        print(f'Running time        : {running_time:.3f} seconds')
-        print(f'Memory consumed     : {mem_cost:.2f} MB')
-        print(f'Total cost          : {solver.ObjectiveValue()}')
-    else:
-        print(f'No solution found for {file_path}')
-
+    with log.phase('output'):
+        if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+            result['cost'] = solver.ObjectiveValue()
+            result['gap'] = gap(solver.ObjectiveValue(), bound)
+            print('--------------Solution Found--------------')
+            for i in range(n):
+                truck = None
+                for m in range(n_copies):
+                    if (i, m) in x and solver.Value(x[(i, m)]) == 1:
+                        truck = truck_id[m]
+                        break
+                print(f"{i + 1} {truck} {scale * solver.Value(l[i])} {scale * solver.Value(b[i])} {int(solver.Value(Ro[i]))}")
+            print('----------------Statistics----------------')
+            print('Status              :', 'OPTIMAL' if status == cp_model.OPTIMAL else 'FEASIBLE')
+            print(f'Time limit          : {time_limit}')
+            print(f'Running time        : {running_time:.3f} seconds')
+            print(f'Memory consumed     : {mem_cost:.2f} MB')
+            print(f'Model               : {formulation} ({n_variables} variables, {n_constraints} constraints)')
+            print(f'Build time          : {build_time:.3f} seconds')
+            print(f'Load time           : {load_time:.3f} seconds')
+            print(f'Total cost          : {solver.ObjectiveValue()}')
+        elif start is not None:
+            # Không có lời giải CP-SAT trong giới hạn thời gian: dùng lời giải heuristic
+            result['cost'] = start.cost
+            result['gap'] = gap(start.cost, bound)
+            print('--------------Heuristic Solution--------------')
+            for i, (m, left, bottom, rotated) in enumerate(start.placements):
+                print(f"{i + 1} {truck_id[m]} {scale * left} {scale * bottom} {rotated}")
+            print('----------------Statistics----------------')
+            print('Status              : HEURISTIC (no CP-SAT solution within the time limit)')
+            print(f'Time limit          : {time_limit}')
+            print(f'Running time        : {running_time:.3f} seconds')
+            print(f'Total cost          : {start.cost}')
+        else:
+            print(f'No solution found for {file_path}')
+
+    # Thời gian wall, CPU và bộ nhớ đỉnh của từng giai đoạn
+    result.update(log.row())
     return result
 
 if __name__ == '__main__':
-    # Cấu hình
-    input_folder = '/home/ad/PycharmProjects/TULKH/2D-bin-packing-problem/input_hust'  # Thay đổi đường dẫn nếu cần
-    output_csv = 'results_cp_huststack_ver1.csv'
-    time_limit = 300
+    parser = argparse.ArgumentParser(description='Chạy mô hình CP trên mọi file của một thư mục, ghi kết quả vào CSV.')
+    add_benchmark_arguments(parser, 'results_cp_huststack_ver1.csv')
+    parser.add_argument('--time-limit', type=int, default=300)
+    parser.add_argument('--models', nargs='+', choices=list(MODELS), default=['bigm', 'interval'],
+                        help='mỗi file được giải với từng mô hình để so sánh')
+    parser.add_argument('--no-cache', dest='cache_dir', action='store_const', const=None, default=CACHE_DIR,
+                        help='luôn tạo mô hình mới thay vì nạp lại mô hình đã lưu')
+    args = parser.parse_args()
 
     # Kiểm tra thư mục đầu vào
-    if not os.path.exists(input_folder):
-        print(f"Thư mục {input_folder} không tồn tại")
+    if not os.path.exists(args.input_folder):
+        print(f"Thư mục {args.input_folder} không tồn tại")
         sys.exit(1)
 
     # Lấy danh sách file .txt
-    input_files = glob.glob(os.path.join(input_folder, '*.txt'))
-    if not input_files:
-        print(f"Không tìm thấy file .txt nào trong {input_folder}")
+    files = input_files(args.input_folder)
+    if not files:
+        print(f"Không tìm thấy file .txt nào trong {args.input_folder}")
         sys.exit(1)
 
-    # Ghi kết quả vào file CSV
-    with open(output_csv, 'w', newline='') as csvfile:
-        fieldnames = ['file_name', 'n', 'k', 'cost', 'running_time', 'mem_cost']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-
-        # Xử lý từng file
-        for file_path in input_files:
-            print(f'\nProcessing file: {file_path}')
-            result = solve_bin_packing(file_path, time_limit)
-            writer.writerow(result)
\ No newline at end of file
+    # Các job chạy song song chia nhau số CPU cho các worker của CP-SAT
+    options = {'workers': max(1, (os.cpu_count() or 1) // args.jobs)} if args.jobs > 1 else None
+    # Mặc định, job bị dừng nếu chạy quá hai lần giới hạn thời gian (tạo mô hình, cận dưới, warm start)
+    time_cap = args.time_cap if args.time_cap is not None else 2 * args.time_limit + 60
+
+    # Mỗi kết quả được ghi thêm vào CSV ngay khi xong; chạy lại sẽ bỏ qua các job đã có
+    fieldnames = ['file_name', 'n', 'k', 'cost', 'running_time', 'mem_cost',
+                  'model', 'build_time', 'load_time', 'n_variables', 'n_constraints', 'warm_start_cost',
+                  'removed_variables', 'removed_constraints', 'workers', 'time_to_best', 'curve',
+                  'lower_bound', 'gap'] + phase_columns(PHASES)
+    jobs = [((os.path.basename(file_path), formulation),
+             (file_path, args.time_limit, formulation, True, True, options, args.cache_dir))
+            for file_path in files for formulation in args.models]
+    # File CSV cũ với các cột khác (ví dụ của phiên bản trước) không được ghi thêm vào
+    try:
+        run_benchmark(solve_bin_packing, jobs, args.output, fieldnames, ('file_name', 'model'), args.jobs, time_cap,
+                      args.memory_cap)
+    except ValueError as error:
+        print(error)
+        sys.exit(1)
@@ -0,0 +1,214 @@
+'''
+    Logic-based Benders decomposition for the truck packing problem.
+
+    - Master (CP-SAT): assign items to trucks with only the area of every truck, the
+      trucks every item fits and the item pairs that cannot share a truck.
+    - Subproblems: can the items the master put in a truck be packed in it in 2D?
+      (common.feasibility, memoized across iterations and instances)
+    - Every truck that cannot hold its items gives a no-good cut: not all of those
+      items (shrunk to a smaller infeasible set first) in that truck nor in any
+      truck with smaller sides.
+    When all the trucks of a master solution pass, it is a packing; the master then
+    has to beat it, and once it is infeasible the best packing is optimal.
+    A check that times out (unknown) also gives a cut, on all the items of the truck,
+    so the master moves on; that cut may remove a feasible assignment, so from then
+    on the search is a heuristic: the master bound is no longer used and the best
+    packing is only reported optimal if it reaches the combinatorial lower bound.
+'''
+import argparse
+import os
+import sys
+import time
+
+from ortools.sat.python import cp_model
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.cp_params import add_solver_arguments, configure_solver, solver_options
+from common.feasibility import FeasibilityCache
+from common.loader import load
+from common.lower_bounds import gap, lower_bound
+from common.presolve import Reduction
+from common.symmetry import add_symmetry_breaking, canonical_start
+from common.truck_types import group_trucks, truck_copies
+from common.warm_start import heuristic_start
+
+
+def build_master(items, trucks, reduction):
+    '''
+        Assignment model: x[(i, m)] = 1 iff item i is in truck m (only for trucks it
+        fits), z[m] = 1 iff truck m is used, the items of a truck fit its area.
+        Return the model, x, z and the cost expression.
+    '''
+    model = cp_model.CpModel()
+    x = {(i, m): model.NewBoolVar(f'x[{i}][{m}]') for i in range(len(items)) for m in reduction.fit[i]}
+    z = {m: model.NewBoolVar(f'z[{m}]') for m in range(len(trucks))}
+
+    for i in range(len(items)):
+        model.AddExactlyOne(x[(i, m)] for m in reduction.fit[i])
+    for m, (W, H, _) in enumerate(trucks):
+        in_truck = [i for i in range(len(items)) if (i, m) in x]
+        model.Add(sum(items[i][0] * items[i][1] * x[(i, m)] for i in in_truck) <= W * H * z[m])
+        for i in in_truck:
+            model.AddImplication(x[(i, m)], z[m])
+    for (i, j), exclusive in reduction.exclusive.items():
+        for m in exclusive:
+            model.AddBoolOr([x[(i, m)].Not(), x[(j, m)].Not()])
+
+    cost = sum(trucks[m][2] * z[m] for m in z)
+    model.Minimize(cost)
+    return model, x, z, cost
+
+
+def infeasible_core(items, truck, cache):
+    '''
+        Shrink items that cannot be packed into truck: drop every item whose removal
+        leaves a set still proven infeasible. Return the indices kept.
+    '''
+    kept = list(range(len(items)))
+    for i in sorted(kept, key=lambda i: items[i][0] * items[i][1]):
+        rest = [j for j in kept if j != i]
+        if rest and cache.pack([items[j] for j in rest], truck) is False:
+            kept = rest
+    return kept
+
+
+def add_cut(model, x, trucks, items_of_cut, truck):
+    '''
+        Forbid items_of_cut together in truck and in every truck with smaller sides.
+        Return the number of constraints added.
+    '''
+    added = 0
+    for m, (W, H, _) in enumerate(trucks):
+        if W <= truck[0] and H <= truck[1] and all((i, m) in x for i in items_of_cut):
+            model.Add(sum(x[(i, m)] for i in items_of_cut) <= len(items_of_cut) - 1)
+            added += 1
+    return added
+
+
+def solve_benders(items, trucks, time_limit=300, cache=None, options=None, verbose=True):
+    '''
+        Solve items (w, h) into trucks (W, H, C) by logic-based Benders decomposition.
+        Return the best cost, its placements [(m, x, y, rotated)] over trucks (0-based),
+        whether it was proven optimal, and statistics.
+    '''
+    cache = cache if cache is not None else FeasibilityCache()
+    options = options or {}
+    deadline = time.monotonic() + time_limit
+    hits, misses, unknown = cache.hits, cache.misses, cache.unknown
+
+    reduction = Reduction(items, trucks)
+    model, x, z, cost = build_master(items, trucks, reduction)
+    add_symmetry_breaking(model, x, z, items, trucks)
+    bound = lower_bound(items, trucks)
+
+    # The heuristic packing is the first incumbent
+    best_cost, best = None, None
+    start = heuristic_start(items, trucks)
+    if start is not None:
+        start = canonical_start(start, items, trucks)
+        best_cost, best = start.cost, start.placements
+        for (i, m), var in x.items():
+            model.AddHint(var, best[i][0] == m)
+        for m in z:
+            model.AddHint(z[m], m in start.used_trucks)
+        model.Add(cost <= best_cost - 1)
+
+    iterations, cuts, optimal = 0, 0, False
+    while time.monotonic() < deadline and (best_cost is None or gap(best_cost, bound) > options.get('gap_limit', 0)):
+        iterations += 1
+        solver = configure_solver(cp_model.CpSolver(), deadline - time.monotonic(), **options)
+        status = solver.Solve(model)
+        if status == cp_model.INFEASIBLE:
+            # No assignment cheaper than the incumbent is left
+            optimal = best_cost is not None and cache.unknown == unknown
+            if optimal:
+                bound = best_cost
+            break
+        if status != cp_model.OPTIMAL and status != cp_model.FEASIBLE:
+            break
+        if status == cp_model.OPTIMAL:
+            # Unless a cut came from an unknown check, the master is a relaxation
+            bound = max(bound, round(solver.ObjectiveValue())) if cache.unknown == unknown else bound
+
+        # Check every used truck in 2D
+        contents = {}
+        for (i, m), var in x.items():
+            if solver.Value(var):
+                contents.setdefault(m, []).append(i)
+        placements = [None] * len(items)
+        for m, in_truck in contents.items():
+            if time.monotonic() >= deadline:
+                placements = None
+                break
+            packing = cache.pack([items[i] for i in in_truck], trucks[m])
+            if packing is None or packing is False:
+                # An unknown check (None) is cut too, or the master would return it again;
+                # the cut may then be wrong, so optimality is no longer claimed (see above)
+                if packing is False:
+                    core = infeasible_core([items[i] for i in in_truck], trucks[m], cache)
+                    in_truck = [in_truck[j] for j in core]
+                cuts += add_cut(model, x, trucks, in_truck, trucks[m])
+                placements = None
+            elif placements is not None:
+                for i, place in zip(in_truck, packing):
+                    placements[i] = (m,) + place
+
+        if placements is not None:
+            best_cost, best = round(solver.ObjectiveValue()), placements
+            model.Add(cost <= best_cost - 1)
+            if verbose:
+                print(f'  iteration {iterations}: packing of cost {best_cost}', file=sys.stderr)
+
+        # Start the next master from this assignment
+        model.ClearHints()
+        for var in x.values():
+            model.AddHint(var, solver.Value(var))
+        for m in z:
+            model.AddHint(z[m], solver.Value(z[m]))
+
+    stats = {'iterations': iterations, 'cuts': cuts, 'bound': bound, 'cache_hits': cache.hits - hits,
+             'cache_misses': cache.misses - misses, 'unknown': cache.unknown - unknown}
+    return best_cost, best, optimal or best_cost == bound, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Logic-based Benders decomposition for the truck packing problem.')
+    parser.add_argument('file_paths', nargs='+', help='instances, solved in turn with one feasibility cache')
+    parser.add_argument('--time-limit', type=float, default=300, help='time limit per instance in seconds')
+    parser.add_argument('--sub-time-limit', type=float, default=10, help='time limit of one feasibility check')
+    parser.add_argument('--cache', metavar='FILE', help='load the feasibility cache from FILE if it exists, '
+                                                        'and save it there at the end')
+    add_solver_arguments(parser)
+    args = parser.parse_args()
+
+    cache = FeasibilityCache(args.sub_time_limit)
+    if args.cache and os.path.exists(args.cache):
+        cache.load(args.cache)
+
+    for file_path in args.file_paths:
+        instance = load(file_path)
+        copies = truck_copies(group_trucks(instance.trucks()), instance.n_items)
+        trucks = [copy[1:] for copy in copies]
+
+        start_time = time.perf_counter()
+        cost, placements, optimal, stats = solve_benders(instance.items(), trucks, args.time_limit, cache,
+                                                         solver_options(args))
+        print(f'File: {os.path.basename(file_path)}')
+        if placements is None:
+            print('NO SOLUTIONS')
+        else:
+            for i, (m, x, y, rotated) in enumerate(placements):
+                print(i + 1, copies[m][0], x, y, rotated)
+            print(f'  - cost            : {cost} ({"optimal" if optimal else "feasible"})')
+            print(f'  - lower bound     : {stats["bound"]} (gap {gap(cost, stats["bound"]):.2%})')
+        print(f'  - iterations      : {stats["iterations"]}, {stats["cuts"]} cuts')
+        print(f'  - feasibility     : {stats["cache_hits"]} cached, {stats["cache_misses"]} checked, '
+              f'{stats["unknown"]} unknown')
+        print(f'  - time            : {time.perf_counter() - start_time:.3f} s')
+
+    if args.cache:
+        cache.save(args.cache)
+
+
+if __name__ == '__main__':
+    main()
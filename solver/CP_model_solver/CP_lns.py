@@ -0,0 +1,213 @@
+'''
+    Large neighbourhood search on top of the heuristic: repeatedly take a few of the
+    least utilized trucks of the current packing with their items, and repack them with
+    a small CP-SAT model (the interval formulation of CP_model_1) into those trucks and
+    a few unused ones. Improvements are kept; neighbourhoods touching disjoint trucks
+    are solved in parallel processes.
+
+    Reads an instance from stdin and writes the packing in the heuristic output format.
+'''
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from ortools.sat.python import cp_model
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from CP_model_1 import add_warm_start, build_model_interval
+from common.loader import read
+from common.lower_bounds import gap, lower_bound
+from common.presolve import Reduction
+from common.symmetry import add_symmetry_breaking, canonical_start
+from common.warm_start import HINT_SHARE, WarmStart, heuristic_start
+
+
+class Packing:
+    '''
+        Current packing: placements[i] = (m, x, y, rotated) of item i in truck m (0-based),
+        and the items of every used truck.
+    '''
+
+    def __init__(self, items, trucks, placements):
+        self.items = items
+        self.trucks = trucks
+        self.placements = list(placements)
+        self.contents = {}
+        for i, placement in enumerate(self.placements):
+            self.contents.setdefault(placement[0], []).append(i)
+
+    @property
+    def cost(self):
+        return sum(self.trucks[m][2] for m in self.contents)
+
+    def utilization(self, m):
+        W, H, _ = self.trucks[m]
+        return sum(self.items[i][0] * self.items[i][1] for i in self.contents[m]) / (W * H)
+
+    def key(self, bins):
+        '''Identify a neighbourhood by its trucks and their items.'''
+        return frozenset((m, frozenset(self.contents[m])) for m in bins)
+
+    def subproblem(self, bins, new_trucks):
+        '''
+            Return the items of the trucks bins, and the trucks bins + new_trucks with the
+            current packing of those items as a WarmStart over them.
+        '''
+        item_ids = [i for m in bins for i in self.contents[m]]
+        sub_trucks = list(bins) + list(new_trucks)
+        index = {m: j for j, m in enumerate(sub_trucks)}
+        placements = [(index[self.placements[i][0]],) + tuple(self.placements[i][1:]) for i in item_ids]
+        start = WarmStart(sum(self.trucks[m][2] for m in bins), placements)
+        return item_ids, sub_trucks, start
+
+    def replace(self, bins, item_ids, sub_trucks, result):
+        '''Put the repacked items of the trucks bins back, result being over sub_trucks.'''
+        for m in bins:
+            del self.contents[m]
+        for i, (j, x, y, rotated) in zip(item_ids, result.placements):
+            self.placements[i] = (sub_trucks[j], x, y, rotated)
+            self.contents.setdefault(sub_trucks[j], []).append(i)
+
+
+def repack(items, trucks, start, time_limit):
+    '''
+        Repack items into trucks with the interval model, starting from start (a WarmStart).
+        Return a cheaper packing as a WarmStart, or None if none was found in time.
+    '''
+    n, k = len(items), len(trucks)
+    data = {'size_item': [list(item) for item in items], 'cost': [truck[2] for truck in trucks]}
+    W_truck = [truck[0] for truck in trucks]
+    H_truck = [truck[1] for truck in trucks]
+
+    model, x, Ro, l, b, z = build_model_interval(n, k, data, W_truck, H_truck, Reduction(data['size_item'], trucks))
+    add_symmetry_breaking(model, x, z, data['size_item'], trucks)
+    hint_time = add_warm_start(model, canonical_start(start, data['size_item'], trucks), data, x, Ro, l, b, z,
+                               HINT_SHARE * time_limit)
+
+    # Neighbourhoods are run in parallel processes, so each one gets a single worker
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = max(0, time_limit - hint_time)
+    solver.parameters.num_workers = 1
+    status = solver.Solve(model)
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE) or solver.ObjectiveValue() >= start.cost:
+        return None
+
+    placements = []
+    for i in range(n):
+        m = next(m for m in range(k) if (i, m) in x and solver.Value(x[(i, m)]) == 1)
+        placements.append((m, solver.Value(l[i]), solver.Value(b[i]), solver.Value(Ro[i])))
+    return WarmStart(round(solver.ObjectiveValue()), placements)
+
+
+def neighbourhoods(packing, size, n_new, count, rng, tried):
+    '''
+        Return up to count neighbourhoods (bins, new trucks) with pairwise disjoint trucks:
+        the least utilized truck left and size - 1 trucks drawn among the next least
+        utilized, plus n_new unused trucks, half the cheapest per area, half the cheapest.
+        Neighbourhoods in tried are skipped.
+    '''
+    used = sorted(packing.contents, key=packing.utilization)
+    unused = [m for m in range(len(packing.trucks)) if m not in packing.contents]
+    by_density = sorted(unused, key=lambda m: packing.trucks[m][2] / (packing.trucks[m][0] * packing.trucks[m][1]))
+    by_cost = sorted(unused, key=lambda m: packing.trucks[m][2])
+
+    taken = set()
+    result = []
+    for seed in used:
+        if len(result) == count:
+            break
+        if seed in taken:
+            continue
+        pool = [m for m in used if m not in taken and m != seed][:2 * size]
+        bins = [seed] + rng.sample(pool, min(size - 1, len(pool)))
+        if packing.key(bins) in tried:
+            continue
+        taken.update(bins)
+
+        new_trucks = []
+        for candidates, wanted in ((by_density, (n_new + 1) // 2), (by_cost, n_new)):
+            for m in candidates:
+                if len(new_trucks) >= wanted:
+                    break
+                if m not in taken:
+                    new_trucks.append(m)
+                    taken.add(m)
+        result.append((bins, new_trucks))
+    return result
+
+
+def lns(items, trucks, start, time_limit=60, size=4, n_new=4, workers=1, sub_time_limit=5, seed=0,
+        patience=20, bound=0):
+    '''
+        Improve start (a WarmStart over trucks) for time_limit seconds and return the best
+        packing as a WarmStart. The search also stops after patience rounds without an
+        improvement, or when the cost reaches bound.
+    '''
+    packing = Packing(items, trucks, start.placements)
+    rng = random.Random(seed)
+    tried = set()
+    deadline = time.monotonic() + time_limit
+    rounds_without_improvement = 0
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        while time.monotonic() < deadline and rounds_without_improvement < patience and packing.cost > bound:
+            chosen = neighbourhoods(packing, size, n_new, workers, rng, tried)
+            if not chosen:
+                break
+            remaining = max(0.1, min(sub_time_limit, deadline - time.monotonic()))
+            subproblems = [packing.subproblem(bins, new_trucks) for bins, new_trucks in chosen]
+            tasks = [([items[i] for i in item_ids], [trucks[m] for m in sub_trucks], sub_start, remaining)
+                     for item_ids, sub_trucks, sub_start in subproblems]
+            if executor is None:
+                results = [repack(*task) for task in tasks]
+            else:
+                results = list(executor.map(repack, *zip(*tasks)))
+
+            improved = False
+            for (bins, _), (item_ids, sub_trucks, _), result in zip(chosen, subproblems, results):
+                if result is None:
+                    tried.add(packing.key(bins))
+                else:
+                    packing.replace(bins, item_ids, sub_trucks, result)
+                    improved = True
+            rounds_without_improvement = 0 if improved else rounds_without_improvement + 1
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    return WarmStart(packing.cost, packing.placements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LNS repacking the least utilized trucks of the heuristic packing '
+                                                 'with CP-SAT; instance read from stdin.')
+    parser.add_argument('--time-limit', type=float, default=60, help='total time in seconds')
+    parser.add_argument('--size', type=int, default=4, help='used trucks per neighbourhood')
+    parser.add_argument('--new-trucks', type=int, default=4, help='unused trucks offered per neighbourhood')
+    parser.add_argument('--sub-time-limit', type=float, default=5, help='time limit of one neighbourhood')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='neighbourhoods solved in parallel')
+    parser.add_argument('--patience', type=int, default=20, help='rounds without improvement before stopping')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    instance = read(sys.stdin.buffer)
+    items, trucks = instance.items(), instance.trucks()
+    start_time = time.monotonic()
+    start = heuristic_start(items, trucks)
+    bound = lower_bound(items, trucks)
+    result = lns(items, trucks, start, args.time_limit, args.size, args.new_trucks, args.workers,
+                 args.sub_time_limit, args.seed, args.patience, bound)
+
+    sys.stdout.write(''.join(f'{i} {m + 1} {x} {y} {rotated}\n'
+                             for i, (m, x, y, rotated) in enumerate(result.placements, start=1)))
+    print(f'Heuristic cost: {start.cost}, LNS cost: {result.cost}, lower bound {bound} '
+          f'(gap {gap(result.cost, bound):.2%}), {time.monotonic() - start_time:.1f} s', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,20 @@
 from ortools.sat.python import cp_model
+import argparse
+import os
 import sys
+import time
+
+import psutil
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.cp_params import ObjectiveTrace, add_solver_arguments, configure_solver, solver_options
+from common.loader import read
+from common.lower_bounds import gap, lower_bound
+from common.model_cache import CACHE_DIR, instance_hash, load_cp_model, save_cp_model
+from common.presolve import Reduction, common_scale
+from common.symmetry import add_symmetry_breaking, canonical_start
+from common.truck_types import group_trucks, truck_copies
+from common.warm_start import HINT_SHARE, complete_hint, heuristic_start
 
 
 def input_data():
@@ -8,32 +23,17 @@ def input_data():
         and a dictionary containing item sizes, truck sizes, and costs.
         Reads input from standard input (keyboard).
     '''
-    data = {}
-    # Read first line: N and K
-    n, k = map(int, input().split())
-    data['size_item'] = []
-    data['size_truck'] = []
-    data['cost'] = []
-
-    # Read N lines for item sizes
-    for _ in range(n):
-        w, l = map(int, input().split())
-        data['size_item'].append([w, l])
-
-    # Read K lines for truck sizes and costs
-    for _ in range(k):
-        w, l, c = map(int, input().split())
-        data['size_truck'].append([w, l])
-        data['cost'].append(c)
-
-    W_truck = [data['size_truck'][i][0] for i in range(k)]
-    H_truck = [data['size_truck'][i][1] for i in range(k)]
-    return n, k, data, W_truck, H_truck
-
-
-def main_solver(time_limit: int = 300):
-    n, k, data, W_truck, H_truck = input_data()
+    return read(sys.stdin.buffer).to_data()
 
+
+def build_model_bigm(n, k, data, W_truck, H_truck, reduction=None):
+    '''
+        Pairwise big-M formulation: for every pair of items and every bin,
+        four direction literals keep the two items apart if both are in the bin.
+        With a Reduction, only item-bin variables and pairs it keeps are created,
+        and coordinates and big-M constants are bounded per item and per bin.
+        Return the model and the variables read back from the solution.
+    '''
     max_W = max(W_truck)
     max_H = max(H_truck)
 
@@ -43,6 +43,17 @@ def main_solver(time_limit: int = 300):
     # Constant for big-M method
     M = 1000000
 
+    # Bins each item may be packed in, and the largest coordinates it may get
+    if reduction is None:
+        fit = [range(k)] * n
+        max_left = max_right = [max_W] * n
+        max_bottom = max_top = [max_H] * n
+    else:
+        fit = reduction.fit
+        max_left, max_bottom = reduction.max_left, reduction.max_bottom
+        max_right = [max((W_truck[m] for m in fit[i]), default=0) for i in range(n)]
+        max_top = [max((H_truck[m] for m in fit[i]), default=0) for i in range(n)]
+
     # Variables
     x = {}  # x[(i,m)] = 1 iff item i is packed in bin m
     Ro = {}  # Ro[i] = 1 if item i is rotated 90 degrees
@@ -53,32 +64,44 @@ def main_solver(time_limit: int = 300):
 
     for i in range(n):
         Ro[i] = model.NewBoolVar(f'Ro[{i}]')
-        l[i] = model.NewIntVar(0, max_W, f'l[{i}]')
-        r[i] = model.NewIntVar(0, max_W, f'r[{i}]')
-        t[i] = model.NewIntVar(0, max_H, f't[{i}]')
-        b[i] = model.NewIntVar(0, max_H, f'b[{i}]')
+        l[i] = model.NewIntVar(0, max_left[i], f'l[{i}]')
+        r[i] = model.NewIntVar(0, max_right[i], f'r[{i}]')
+        t[i] = model.NewIntVar(0, max_top[i], f't[{i}]')
+        b[i] = model.NewIntVar(0, max_bottom[i], f'b[{i}]')
 
         # Coordinate constraints based on rotation
         model.Add(r[i] == l[i] + (1 - Ro[i]) * data['size_item'][i][0] + Ro[i] * data['size_item'][i][1])
         model.Add(t[i] == b[i] + (1 - Ro[i]) * data['size_item'][i][1] + Ro[i] * data['size_item'][i][0])
 
-        for m in range(k):
+        for m in fit[i]:
             x[(i, m)] = model.NewBoolVar(f'x_[{i}]_[{m}]')
 
             # Item must not exceed bin area
-            model.Add(r[i] <= (1 - x[(i, m)]) * M + W_truck[m])
-            model.Add(l[i] <= (1 - x[(i, m)]) * M + W_truck[m])
-            model.Add(t[i] <= (1 - x[(i, m)]) * M + H_truck[m])
-            model.Add(b[i] <= (1 - x[(i, m)]) * M + H_truck[m])
+            M_W = M if reduction is None else max_right[i] - W_truck[m]
+            M_H = M if reduction is None else max_top[i] - H_truck[m]
+            model.Add(r[i] <= (1 - x[(i, m)]) * M_W + W_truck[m])
+            model.Add(l[i] <= (1 - x[(i, m)]) * M_W + W_truck[m])
+            model.Add(t[i] <= (1 - x[(i, m)]) * M_H + H_truck[m])
+            model.Add(b[i] <= (1 - x[(i, m)]) * M_H + H_truck[m])
 
     # Each item must be packed in exactly one bin
     for i in range(n):
-        model.Add(sum(x[(i, m)] for m in range(k)) == 1)
+        model.Add(sum(x[(i, m)] for m in fit[i]) == 1)
 
     # If two items are in the same bin, they must not overlap
     for i in range(n - 1):
         for j in range(i + 1, n):
-            for m in range(k):
+            if reduction is None:
+                shared = [(m, True) for m in range(k)]
+            else:
+                shared = reduction.shared(i, j)
+            M_ij = M if reduction is None else max(max_right[i], max_right[j], max_top[i], max_top[j])
+            for m, together in shared:
+                if not together:
+                    # Side by side the two items do not fit the bin: at most one of them is in it
+                    model.AddBoolOr([x[(i, m)].Not(), x[(j, m)].Not()])
+                    continue
+
                 e = model.NewBoolVar(f'e[{i}][{j}]')
                 model.Add(e >= x[(i, m)] + x[(j, m)] - 1)
                 model.Add(e <= x[(i, m)])
@@ -91,10 +114,10 @@ def main_solver(time_limit: int = 300):
                 c4 = model.NewBoolVar(f'c4[{i}][{j}]')
 
                 # Non-overlap constraints using big-M
-                model.Add(r[i] <= l[j] + M * (1 - c1))
-                model.Add(r[j] <= l[i] + M * (1 - c2))
-                model.Add(t[i] <= b[j] + M * (1 - c3))
-                model.Add(t[j] <= b[i] + M * (1 - c4))
+                model.Add(r[i] <= l[j] + M_ij * (1 - c1))
+                model.Add(r[j] <= l[i] + M_ij * (1 - c2))
+                model.Add(t[i] <= b[j] + M_ij * (1 - c3))
+                model.Add(t[j] <= b[i] + M_ij * (1 - c4))
 
                 model.Add(c1 + c2 + c3 + c4 + (1 - e) * M >= 1)
                 model.Add(c1 + c2 + c3 + c4 <= e * M)
@@ -104,7 +127,7 @@ def main_solver(time_limit: int = 300):
     for m in range(k):
         z[m] = model.NewBoolVar(f'z[{m}]')
         q = model.NewIntVar(0, n, f'q[{m}]')
-        model.Add(q == sum(x[(i, m)] for i in range(n)))
+        model.Add(q == sum(x[(i, m)] for i in range(n) if (i, m) in x))
         model.Add(z[m] <= q * M)
         model.Add(q <= z[m] * M)
 
@@ -112,29 +135,301 @@ def main_solver(time_limit: int = 300):
     cost = sum(z[m] * data['cost'][m] for m in range(k))
     model.Minimize(cost)
 
-    # Create a solver and solve the model
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = time_limit
-    status = solver.Solve(model)
+    if reduction is not None:
+        # Every item-bin variable comes with 4 bound constraints; every pair in a bin with
+        # 5 variables and 9 constraints, replaced by one clause if the items cannot share it
+        reduction.removed_variables += reduction.removed_item_trucks + 5 * (
+            reduction.removed_pairs + reduction.exclusive_pairs)
+        reduction.removed_constraints += 4 * reduction.removed_item_trucks + 9 * reduction.removed_pairs + 8 * (
+            reduction.exclusive_pairs)
 
-    # Print the results in the required format
-    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+    return model, x, Ro, l, b, z
+
+
+def build_model_interval(n, k, data, W_truck, H_truck, reduction=None):
+    '''
+        Optional-interval formulation: item i in bin m with orientation o is an
+        optional fixed-size interval on each axis, present iff p[(i,m,o)] = 1, and
+        every bin gets one NoOverlap2D over the intervals that may be placed in it.
+        Only orientations that fit the bin are created.
+        With a Reduction, coordinates are bounded per item and pairs of items that
+        cannot share a bin get a clause keeping them apart.
+        Return the model and the variables read back from the solution.
+    '''
+    max_W = max(W_truck)
+    max_H = max(H_truck)
+
+    model = cp_model.CpModel()
+
+    x = {}  # x[(i,m)] = 1 iff item i is packed in bin m
+    Ro = {}  # Ro[i] = 1 if item i is rotated 90 degrees
+    l = {}  # left coordinate of item
+    b = {}  # bottom coordinate of item
+    p = {}  # p[(i,m,o)] = 1 iff item i is packed in bin m with orientation o
+    x_intervals = [[] for _ in range(k)]
+    y_intervals = [[] for _ in range(k)]
+    skipped_orientations = 0  # (i, m, o) not created because the item does not fit the bin that way
+    skipped_bins = 0  # (i, m) not created because the item fits the bin in no orientation
+
+    for i in range(n):
+        w, h = data['size_item'][i]
+        Ro[i] = model.NewBoolVar(f'Ro[{i}]')
+        l[i] = model.NewIntVar(0, max_W if reduction is None else reduction.max_left[i], f'l[{i}]')
+        b[i] = model.NewIntVar(0, max_H if reduction is None else reduction.max_bottom[i], f'b[{i}]')
+
+        placed = []  # every p[(i,m,o)] of item i
+        rotated = []  # those with o = 1
+        for m in range(k):
+            orientations = []
+            for o, (size_x, size_y) in enumerate(((w, h), (h, w))):
+                if o == 1 and w == h:
+                    continue
+                if size_x > W_truck[m] or size_y > H_truck[m]:
+                    skipped_orientations += 1
+                    continue
+                p[(i, m, o)] = model.NewBoolVar(f'p[{i}][{m}][{o}]')
+                x_intervals[m].append(model.NewOptionalFixedSizeIntervalVar(
+                    l[i], size_x, p[(i, m, o)], f'ix[{i}][{m}][{o}]'))
+                y_intervals[m].append(model.NewOptionalFixedSizeIntervalVar(
+                    b[i], size_y, p[(i, m, o)], f'iy[{i}][{m}][{o}]'))
+
+                # Item must not exceed bin area
+                model.Add(l[i] + size_x <= W_truck[m]).OnlyEnforceIf(p[(i, m, o)])
+                model.Add(b[i] + size_y <= H_truck[m]).OnlyEnforceIf(p[(i, m, o)])
+                orientations.append(p[(i, m, o)])
+                if o == 1:
+                    rotated.append(p[(i, m, o)])
+            placed.extend(orientations)
+            if orientations:
+                x[(i, m)] = model.NewBoolVar(f'x_[{i}]_[{m}]')
+                model.Add(x[(i, m)] == sum(orientations))
+            else:
+                skipped_bins += 1
+
+        # Each item must be packed in exactly one bin with one orientation
+        model.AddExactlyOne(placed)
+        model.Add(Ro[i] == sum(rotated))
+
+    # If two items are in the same bin, they must not overlap
+    for m in range(k):
+        model.AddNoOverlap2D(x_intervals[m], y_intervals[m])
+    if reduction is not None:
+        for (i, j), exclusive in reduction.exclusive.items():
+            for m in exclusive:
+                model.AddBoolOr([x[(i, m)].Not(), x[(j, m)].Not()])
+
+    # Determine which bins are used
+    z = {}
+    for m in range(k):
+        z[m] = model.NewBoolVar(f'z[{m}]')
+        for i in range(n):
+            if (i, m) in x:
+                model.AddImplication(x[(i, m)], z[m])
+        model.AddBoolOr([x[(i, m)] for i in range(n) if (i, m) in x]).OnlyEnforceIf(z[m])
+
+    # Objective function
+    cost = sum(z[m] * data['cost'][m] for m in range(k))
+    model.Minimize(cost)
+
+    if reduction is not None:
+        # Every orientation that does not fit comes with a literal, 2 intervals and 2 bound
+        # constraints; every bin that fits in none with x, its link and its implication to z.
+        # Exclusive pairs add one clause each
+        reduction.removed_variables += skipped_orientations + skipped_bins
+        reduction.removed_constraints += 4 * skipped_orientations + 2 * skipped_bins - reduction.exclusive_pairs
+
+    return model, x, Ro, l, b, z
+
+
+def add_warm_start(model, start, data, x, Ro, l, b, z, time_limit):
+    '''
+        Hint the packing of a WarmStart to the solver and bound the cost by its cost.
+        Completing the hint takes at most time_limit seconds; return the time it took.
+    '''
+    for (i, m), var in x.items():
+        model.AddHint(var, start.placements[i][0] == m)
+    for i, (_, left, bottom, rotated) in enumerate(start.placements):
+        model.AddHint(Ro[i], rotated)
+        model.AddHint(l[i], left)
+        model.AddHint(b[i], bottom)
+    used = start.used_trucks
+    for m in z:
+        model.AddHint(z[m], m in used)
+
+    # Only solutions at most as expensive as the heuristic one are of interest
+    model.Add(sum(z[m] * data['cost'][m] for m in z) <= start.cost)
+    return complete_hint(model, time_limit)
+
+
+MODELS = {
+    'bigm': build_model_bigm,
+    'interval': build_model_interval,
+}
+
+
+def model_size(model):
+    '''
+        Return the number of variables and constraints of a built model.
+    '''
+    proto = model.Proto()
+    return len(proto.variables), len(proto.constraints)
+
+
+# Counters of a Reduction kept with cached models, to report them after a load
+PRESOLVE_COUNTERS = ['removed_item_trucks', 'removed_pairs', 'exclusive_pairs', 'removed_variables',
+                     'removed_constraints']
+
+
+def build_or_load(formulation, n, data, trucks, presolve=True, cache_dir=None):
+    '''
+        Build a formulation for the items of data and trucks (W, H, C), with a Reduction
+        if presolve. With a cache_dir, a model built before for the same instance is
+        loaded instead, and a new one is saved there.
+        Return the model, its variables (x, Ro, l, b, z), the presolve counters (None
+        without presolve), the build time and the load time (0 for the one not done).
+    '''
+    key = instance_hash(formulation, data['size_item'], trucks, presolve)
+    load_start = time.perf_counter()
+    cached = load_cp_model(cache_dir, key) if cache_dir else None
+    if cached is not None:
+        model, variables, counters = cached
+        variables = tuple(variables[name] for name in ('x', 'Ro', 'l', 'b', 'z'))
+        return model, variables, counters, 0, time.perf_counter() - load_start
+
+    build_start = time.perf_counter()
+    reduction = Reduction(data['size_item'], trucks) if presolve else None
+    W_truck = [truck[0] for truck in trucks]
+    H_truck = [truck[1] for truck in trucks]
+    model, x, Ro, l, b, z = MODELS[formulation](n, len(trucks), data, W_truck, H_truck, reduction)
+    build_time = time.perf_counter() - build_start
+    counters = {name: getattr(reduction, name) for name in PRESOLVE_COUNTERS} if presolve else None
+    if cache_dir:
+        save_cp_model(cache_dir, key, model, {'x': x, 'Ro': Ro, 'l': l, 'b': b, 'z': z}, counters)
+    return model, (x, Ro, l, b, z), counters, build_time, 0
+
+
+def main_solver(time_limit: int = 300, formulation: str = 'bigm', warm_start: bool = True,
+                symmetry_breaking: bool = True, presolve: bool = True, options: dict = None, stream=None,
+                cache_dir: str = None):
+    n, k, data, W_truck, H_truck = input_data()
+
+    # Identical trucks are grouped into types; no type needs more than n copies
+    copies = truck_copies(group_trucks(zip(W_truck, H_truck, data['cost'])), n)
+    k = len(copies)
+    truck_id = [copy[0] for copy in copies]
+    trucks = [copy[1:] for copy in copies]
+    data['cost'] = [copy[3] for copy in copies]
+
+    # Build (or load) the model, measuring time and memory of the construction (presolve included)
+    process = psutil.Process(os.getpid())
+    mem_before = process.memory_info().rss / 1024 / 1024
+    scale = 1
+    if presolve:
+        # Sides are divided by their common divisor; coordinates are scaled back on output
+        scale = common_scale(data['size_item'], trucks)
+        data['size_item'] = [[w // scale, h // scale] for w, h in data['size_item']]
+        trucks = [(W // scale, H // scale, C) for W, H, C in trucks]
+    model, (x, Ro, l, b, z), counters, build_time, load_time = build_or_load(
+        formulation, n, data, trucks, presolve, cache_dir)
+    build_mem = process.memory_info().rss / 1024 / 1024 - mem_before
+    n_variables, n_constraints = model_size(model)
+
+    # Keep one packing out of those that only swap identical trucks or identical items
+    n_symmetry = add_symmetry_breaking(model, x, z, data['size_item'], trucks) if symmetry_breaking else 0
+
+    # Start from the heuristic packing of the same truck copies
+    start = None
+    hint_time = 0
+    if warm_start:
+        heuristic_time = time.perf_counter()
+        start = heuristic_start(data['size_item'], trucks)
+        heuristic_time = time.perf_counter() - heuristic_time
+        if start is not None:
+            if symmetry_breaking:
+                start = canonical_start(start, data['size_item'], trucks)
+            hint_time = add_warm_start(model, start, data, x, Ro, l, b, z, HINT_SHARE * time_limit)
+
+    def placements(solution):
+        '''
+            Return [item, truck, x, y, rotated] of every item in a solution (a solver or
+            a solution callback), with the numbering and coordinates of the input.
+        '''
+        result = []
         for i in range(n):
             truck = None
             for m in range(k):
-                if solver.Value(x[(i, m)]) == 1:
-                    truck = m + 1  # Truck numbers are 1-based
+                if (i, m) in x and solution.Value(x[(i, m)]) == 1:
+                    truck = truck_id[m]  # Truck numbers are 1-based
                     break
-            print(f"{i + 1} {truck} {solver.Value(l[i])} {solver.Value(b[i])} {int(solver.Value(Ro[i]))}")
+            result.append([i + 1, truck, scale * solution.Value(l[i]), scale * solution.Value(b[i]),
+                           int(solution.Value(Ro[i]))])
+        return result
+
+    # Create a solver and solve the model; improving solutions are streamed if asked and
+    # the search stops once the cost is within the gap limit of the lower bound
+    options = options or {}
+    bound = lower_bound(data['size_item'], trucks)
+    # Completing the hint counts against the time limit
+    solver = configure_solver(cp_model.CpSolver(), max(0, time_limit - hint_time), **options)
+    trace = ObjectiveTrace(stream, placements, bound, options.get('gap_limit', 0))
+    status = solver.Solve(model, trace)
+
+    # Print the results in the required format
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        for placement in placements(solver):
+            print(*placement)
         print(f'  - branches        : {solver.NumBranches()}')
+        print(f'  - time to best    : {trace.time_to_best:.3f} s')
+        print(f'  - lower bound     : {bound} (gap {gap(solver.ObjectiveValue(), bound):.2%})')
+    elif start is not None:
+        # No solution within the time limit: the heuristic packing is still a valid one
+        for i, (m, left, bottom, rotated) in enumerate(start.placements):
+            print(i + 1, truck_id[m], scale * left, scale * bottom, rotated)
+        print('  - status          : heuristic (no CP-SAT solution within the time limit)')
+        print(f'  - lower bound     : {bound} (gap {gap(start.cost, bound):.2%})')
     else:
         print("NO SOLUTIONS")
+    print(f'  - model           : {formulation}')
+    print(f'  - variables       : {n_variables}')
+    print(f'  - constraints     : {n_constraints}')
+    print(f'  - symmetry        : {n_symmetry} constraints')
+    if counters is not None:
+        print(f'  - presolve        : scale {scale}, {counters["removed_item_trucks"]} item-bin pairs and '
+              f'{counters["removed_pairs"]} item pair-bins dropped, {counters["exclusive_pairs"]} item pair-bins exclusive')
+        print(f'  - removed         : {counters["removed_variables"]} variables, {counters["removed_constraints"]} constraints')
+    print(f'  - build time      : {build_time:.3f} s')
+    print(f'  - load time       : {load_time:.3f} s')
+    print(f'  - build memory    : {build_mem:.2f} MB')
+    if start is not None:
+        print(f'  - warm start cost : {start.cost} ({heuristic_time:.3f} s)')
 
 
 if __name__ == "__main__":
-    try:
-        time_limit = int(sys.argv[1])
-    except IndexError:
-        time_limit = 300
+    parser = argparse.ArgumentParser(description='CP-SAT model for the truck packing problem, instance read from stdin.')
+    parser.add_argument('time_limit', nargs='?', type=int, default=300)
+    parser.add_argument('--model', choices=list(MODELS), default='bigm',
+                        help='bigm: pairwise big-M constraints per bin; interval: optional intervals and NoOverlap2D')
+    parser.add_argument('--no-warm-start', dest='warm_start', action='store_false',
+                        help='do not hint the heuristic packing to the solver')
+    parser.add_argument('--no-symmetry-breaking', dest='symmetry_breaking', action='store_false',
+                        help='do not order identical trucks and identical items')
+    parser.add_argument('--no-presolve', dest='presolve', action='store_false',
+                        help='do not scale the sides, drop item-bin pairs that cannot fit or bound coordinates')
+    add_solver_arguments(parser)
+    parser.add_argument('--stream', metavar='FILE',
+                        help="write every improving solution as a JSON line to FILE ('-' for stdout)")
+    parser.add_argument('--cache', dest='cache_dir', nargs='?', const=CACHE_DIR, metavar='DIR',
+                        help=f'load the model from DIR if built before, else save it there (default {CACHE_DIR})')
+    args = parser.parse_args()
 
-    main_solver(time_limit)
\ No newline at end of file
+    stream = None
+    if args.stream == '-':
+        stream = sys.stdout
+    elif args.stream:
+        stream = open(args.stream, 'w')
+    try:
+        main_solver(args.time_limit, args.model, args.warm_start, args.symmetry_breaking, args.presolve,
+                    solver_options(args), stream, args.cache_dir)
+    finally:
+        if stream is not None and stream is not sys.stdout:
+            stream.close()
@@ -1,8 +1,18 @@
 # If the pack is rotated, then change the width and height of the pack
 
 from ortools.sat.python import cp_model
+import argparse
+import os
 import sys
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.cp_params import ObjectiveTrace, add_solver_arguments, configure_solver, solver_options
+from common.loader import load
+from common.lower_bounds import gap, lower_bound
+from common.symmetry import add_symmetry_breaking, canonical_start
+from common.truck_types import group_trucks, truck_copies
+from common.warm_start import HINT_SHARE, complete_hint, heuristic_start
+
 def read_input(file_path):
     '''
         Return number of packs (n_packs); number of bins (n_bins); 
@@ -10,21 +20,18 @@ def read_input(file_path):
 
         file_path: path to file containing the input data
     '''
-    with open(file_path) as f:
-        data = f.readlines()
-        n_packs, n_bins = map(int, data[0].split())
-        packs, bins = [], []
-
-        for i in range(1, n_packs+1):
-            packs.append(tuple(map(int, data[i].split())))
+    instance = load(file_path)
+    return instance.n_items, instance.n_trucks, instance.items(), instance.trucks()
 
-        for i in range(n_packs+1, len(data)):
-            bins.append(tuple(map(int, data[i].split())))
+def main_solver(file_path, time_limit, warm_start=True, symmetry_breaking=True, options=None, stream=None):
+    n_packs, n_bins, packs, bins = read_input(file_path)
 
-    return n_packs, n_bins, packs, bins
+    # Identical bins are grouped into types; no type needs more than n_packs copies
+    copies = truck_copies(group_trucks(bins), n_packs)
+    bin_id = [copy[0] for copy in copies]
+    bins = [copy[1:] for copy in copies]
+    n_bins = len(bins)
 
-def main_solver(file_path, time_limit):
-    n_packs, n_bins, packs, bins = read_input(file_path)
     max_width = max(x[0] for x in bins)
     max_height = max(x[1] for x in bins)
     max_pack_width = max(x[0] for x in packs)
@@ -115,15 +122,58 @@ def main_solver(file_path, time_limit):
     cost = sum(Z[j] * bins[j][2] for j in range(n_bins))
     model.Minimize(cost)
 
+    # Keep one packing out of those that only swap identical bins or identical packs
+    if symmetry_breaking:
+        add_symmetry_breaking(model, X, Z, packs, bins)
+
+    # Warm start: hint the heuristic packing and keep only solutions at most as expensive
+    start = heuristic_start(packs, bins) if warm_start else None
+    hint_time = 0
+    if start is not None:
+        if symmetry_breaking:
+            start = canonical_start(start, packs, bins)
+        used = start.used_trucks
+        for i, (m, corner_x, corner_y, rotated) in enumerate(start.placements):
+            pack_width, pack_height = packs[i][rotated], packs[i][1 - rotated]
+            model.AddHint(R[i], rotated)
+            model.AddHint(width[i], pack_width)
+            model.AddHint(height[i], pack_height)
+            model.AddHint(x[i], corner_x + pack_width)
+            model.AddHint(y[i], corner_y + pack_height)
+            for j in range(n_bins):
+                model.AddHint(X[i, j], j == m)
+        for j in range(n_bins):
+            model.AddHint(Z[j], j in used)
+        model.Add(cost <= start.cost)
+        hint_time = complete_hint(model, HINT_SHARE * time_limit)
+
     # Creates a solver and solves the model
-    solver = cp_model.CpSolver()
-    solver.parameters.max_time_in_seconds = time_limit
-    status = solver.Solve(model)
+    def placements(solution):
+        '''
+            Return [pack, bin, x, y, rotated] of every pack in a solution, with the
+            bottom left corner (x, y) and the bin numbers of the input.
+        '''
+        result = []
+        for i in range(n_packs):
+            j = next(j for j in range(n_bins) if solution.Value(X[i, j]) == 1)
+            result.append([i + 1, bin_id[j], solution.Value(x[i]) - solution.Value(width[i]),
+                           solution.Value(y[i]) - solution.Value(height[i]), solution.Value(R[i])])
+        return result
+
+    # Improving solutions are streamed as JSON lines if asked; the search stops once the
+    # cost is within the gap limit of the lower bound
+    options = options or {}
+    bound = lower_bound(packs, bins)
+    # Completing the hint counts against the time limit
+    solver = configure_solver(cp_model.CpSolver(), max(0, time_limit - hint_time), **options)
+    status = solver.Solve(model, ObjectiveTrace(stream, placements, bound, options.get('gap_limit', 0)))
 
     # Print the results
     print('----------------Given data----------------')
     print(f'Number of pack given: {n_packs}')
     print(f'Number of bin given : {n_bins}')
+    if start is not None:
+        print(f'Warm start cost     : {start.cost}')
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
         print('--------------Solution Found--------------')
 
@@ -136,34 +186,57 @@ def main_solver(file_path, time_limit):
                 print(f'Put pack {i+1}', end=' ')
             for j in range(n_bins):
                 if solver.Value(X[i, j]) == 1:
-                    print(f'in bin {j+1}', end=' ')
+                    print(f'in bin {bin_id[j]}', end=' ')
             print(f'that the top right corner coordinate (x, y) is ({solver.Value(x[i])}, {solver.Value(y[i])})')
 
         print(f'Number of bin used  : {sum(solver.Value(Z[i]) for i in range(n_bins))}')
         print(f'Total cost          : {solver.ObjectiveValue()}')
+        print(f'Lower bound         : {bound} (gap {gap(solver.ObjectiveValue(), bound):.2%})')
         print('----------------Statistics----------------')
         print(f'Status              : {solver.StatusName(status)}')
         print(f'Time limit          : {time_limit}')
         print(f'Running time        : {solver.UserTime()}')
         print(f'Explored branches   : {solver.NumBranches()}')
+    elif start is not None:
+        # No solution within the time limit: the heuristic packing is still a valid one
+        print('--------------Heuristic Solution--------------')
+        for i, (m, corner_x, corner_y, rotated) in enumerate(start.placements):
+            pack_width, pack_height = packs[i][rotated], packs[i][1 - rotated]
+            print(f'Rotate pack {i+1} and put' if rotated else f'Put pack {i+1}', end=' ')
+            print(f'in bin {bin_id[m]} that the top right corner coordinate (x, y) is '
+                  f'({corner_x + pack_width}, {corner_y + pack_height})')
+        print(f'Number of bin used  : {len(start.used_trucks)}')
+        print(f'Total cost          : {start.cost}')
+        print(f'Lower bound         : {bound} (gap {gap(start.cost, bound):.2%})')
+        print('----------------Statistics----------------')
+        print('Status              : HEURISTIC (no CP-SAT solution within the time limit)')
+        print(f'Time limit          : {time_limit}')
     else:
         print('NO SOLUTIONS')
     
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='CP-SAT model for the truck packing problem.')
+    # Default input file and time limit if they are not specified
+    parser.add_argument('file_path', nargs='?', default='input_data/0015.txt')
+    parser.add_argument('time_limit', nargs='?', type=int, default=300)
+    parser.add_argument('--no-warm-start', dest='warm_start', action='store_false',
+                        help='do not hint the heuristic packing to the solver')
+    parser.add_argument('--no-symmetry-breaking', dest='symmetry_breaking', action='store_false',
+                        help='do not order identical bins and identical packs')
+    add_solver_arguments(parser)
+    parser.add_argument('--stream', metavar='FILE',
+                        help="write every improving solution as a JSON line to FILE ('-' for stdout)")
+    args = parser.parse_args()
+
+    stream = None
+    if args.stream == '-':
+        stream = sys.stdout
+    elif args.stream:
+        stream = open(args.stream, 'w')
     try:
-        # Get input file path
-        file_path = sys.argv[1]
-    except IndexError:
-        # Default input file if file path is not specified
-        file_path = 'input_data/0015.txt'
-
-    try:
-        # Get input file path
-        time_limit = int(sys.argv[2])
-    except IndexError:
-        # Default input file if file path is not specified
-        time_limit = 300
-        
-    main_solver(file_path, time_limit)
-    
+        main_solver(args.file_path, args.time_limit, args.warm_start, args.symmetry_breaking, solver_options(args),
+                    stream)
+    finally:
+        if stream is not None and stream is not sys.stdout:
+            stream.close()
@@ -0,0 +1,65 @@
+'''
+    Compare CP-SAT worker counts: solve every instance of input_data with 1, 4, 8 and
+    16 workers and record the time needed to reach the best cost of each run.
+    Results are written to a CSV file, one row per instance and worker count.
+'''
+import argparse
+import csv
+import glob
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from CP_analysis import solve_bin_packing
+from CP_model_1 import MODELS
+from common.cp_params import SEARCH_PORTFOLIOS
+from common.model_cache import CACHE_DIR
+
+INPUT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'input_data')
+
+
+def instance_size(file_path):
+    with open(file_path) as f:
+        return int(f.readline().split()[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time to the best cost of CP-SAT for several worker counts.')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8, 16])
+    parser.add_argument('--time-limit', type=int, default=60)
+    parser.add_argument('--model', choices=list(MODELS), default='interval')
+    parser.add_argument('--search', choices=list(SEARCH_PORTFOLIOS), default='default')
+    parser.add_argument('--max-items', type=int, default=30, help='skip instances with more items')
+    parser.add_argument('--input-folder', default=INPUT_FOLDER)
+    parser.add_argument('--output', default='results_cp_workers.csv')
+    parser.add_argument('--no-cache', dest='cache_dir', action='store_const', const=None, default=CACHE_DIR,
+                        help='build the model for every worker count instead of loading it after the first one')
+    args = parser.parse_args()
+
+    input_files = sorted(glob.glob(os.path.join(args.input_folder, '*.txt')), key=instance_size)
+    input_files = [file_path for file_path in input_files if instance_size(file_path) <= args.max_items]
+
+    rows = []
+    for file_path in input_files:
+        for workers in args.workers:
+            print(f'\nProcessing file: {file_path} ({workers} workers)')
+            options = {'workers': workers, 'search': args.search}
+            rows.append(solve_bin_packing(file_path, args.time_limit, args.model, options=options,
+                                          cache_dir=args.cache_dir))
+
+    with open(args.output, 'w', newline='') as csvfile:
+        fieldnames = ['file_name', 'n', 'k', 'model', 'workers', 'cost', 'time_to_best', 'running_time', 'curve']
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+    # Summary: time to the best cost per instance, one column per worker count
+    print(f'\n{"file":<12}' + ''.join(f'{f"{workers} workers":>14}' for workers in args.workers))
+    for start in range(0, len(rows), len(args.workers)):
+        line = rows[start:start + len(args.workers)]
+        print(f'{line[0]["file_name"]:<12}' + ''.join(
+            f'{row["time_to_best"]:>9.2f}s {row["cost"]:>3g}' for row in line))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,20 @@
+import heapq
+import itertools
+import os
 import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 
 # Constants
-MAXN = 10007
 INF = float('inf')
-
-# Global variables
-N_items = 0
-N_bins = 0
-bin_used = 0
-total_cost = 0
-check_algorithm = False
+# Free-rectangle lists shorter than this are ranked with a plain loop,
+# which is cheaper than the NumPy call overhead
+VECTORIZE_MIN_FREE_REC = 32
+# Instances with at least this many items run the two algorithms in parallel processes
+# (when more than one CPU is available)
+PARALLEL_MIN_ITEMS = 2000
 
 
 # Item structure
@@ -33,6 +38,7 @@ class FreeRectangle:
         self.width = 0
         self.height = 0
         self.area = 0
+        self.order = 0  # set when added to a FreeRectangleList
 
     def __eq__(self, other):
         return (self.corner_x == other.corner_x and
@@ -40,6 +46,118 @@ class FreeRectangle:
                 self.width == other.width and
                 self.height == other.height)
 
+    def __hash__(self):
+        return hash((self.corner_x, self.corner_y, self.width, self.height))
+
+
+# Add delta to counts[side] and return the longest side left with a non-zero count
+def update_side_count(counts, side, delta, longest):
+    if side >= len(counts):
+        counts.extend([0] * (side + 1 - len(counts)))
+    counts[side] += delta
+    if delta > 0:
+        return max(longest, side)
+    while longest > 0 and counts[longest] == 0:
+        longest -= 1
+    return longest
+
+
+# Free rectangles of a bin, mirrored into columnar arrays (x, y, w, h) for vectorized ranking.
+# Rectangles are never modified after being added, so only append and del need to keep the
+# columns in sync. Rectangles are only appended, so the list stays in the order they were
+# added; every rectangle keeps its rank in that order, and its position is a binary search.
+class FreeRectangleList(list):
+    def __init__(self):
+        super().__init__()
+        self.corner_x = np.zeros(8, dtype=np.int64)
+        self.corner_y = np.zeros(8, dtype=np.int64)
+        self.width = np.zeros(8, dtype=np.int64)
+        self.height = np.zeros(8, dtype=np.int64)
+        self.order = np.zeros(8, dtype=np.int64)
+        self.added = 0
+        # Number of rectangles by short side and by long side, and the longest of each
+        self.short_count = []
+        self.long_count = []
+        self.max_short = 0
+        self.max_long = 0
+
+    def _count(self, rec, delta):
+        if rec.width < rec.height:
+            short_side, long_side = rec.width, rec.height
+        else:
+            short_side, long_side = rec.height, rec.width
+        self.max_short = update_side_count(self.short_count, short_side, delta, self.max_short)
+        self.max_long = update_side_count(self.long_count, long_side, delta, self.max_long)
+
+    def append(self, rec):
+        n = len(self)
+        if n == len(self.width):
+            self.corner_x = np.resize(self.corner_x, 2 * n)
+            self.corner_y = np.resize(self.corner_y, 2 * n)
+            self.width = np.resize(self.width, 2 * n)
+            self.height = np.resize(self.height, 2 * n)
+            self.order = np.resize(self.order, 2 * n)
+        self.corner_x[n] = rec.corner_x
+        self.corner_y[n] = rec.corner_y
+        self.width[n] = rec.width
+        self.height[n] = rec.height
+        rec.order = self.order[n] = self.added
+        self.added += 1
+        self._count(rec, 1)
+        super().append(rec)
+
+    def extend(self, recs):
+        for rec in recs:
+            self.append(rec)
+
+    def __delitem__(self, i):
+        self._count(self[i], -1)
+        super().__delitem__(i)
+        n = len(self)
+        for column in (self.corner_x, self.corner_y, self.width, self.height, self.order):
+            column[i:n] = column[i + 1:n + 1]
+
+    def position(self, rec):
+        return int(np.searchsorted(self.order[:len(self)], rec.order))
+
+    # Positions of the rectangles that overlap the placed item, in list order
+    def intersecting(self, pack):
+        n = len(self)
+        x = self.corner_x[:n]
+        y = self.corner_y[:n]
+        hit = ((pack.corner_x < x + self.width[:n]) & (pack.corner_y < y + self.height[:n]) &
+               (pack.corner_x + pack.width > x) & (pack.corner_y + pack.height > y))
+        return np.flatnonzero(hit).tolist()
+
+    # Positions of the rectangles that contain rec, and of those that rec contains
+    def containment(self, rec):
+        n = len(self)
+        x = self.corner_x[:n]
+        y = self.corner_y[:n]
+        right = x + self.width[:n]
+        top = y + self.height[:n]
+        rec_right = rec.corner_x + rec.width
+        rec_top = rec.corner_y + rec.height
+        covering = (x <= rec.corner_x) & (y <= rec.corner_y) & (right >= rec_right) & (top >= rec_top)
+        covered = (x >= rec.corner_x) & (y >= rec.corner_y) & (right <= rec_right) & (top <= rec_top)
+        return np.flatnonzero(covering).tolist(), np.flatnonzero(covered).tolist()
+
+    # Delete several positions (ascending) with one compaction of the list and the columns
+    def delete_many(self, positions):
+        if not positions:
+            return
+        n = len(self)
+        keep = np.ones(n, dtype=bool)
+        keep[positions] = False
+        for i in positions:
+            self._count(self[i], -1)
+        kept = [rec for rec, k in zip(self, keep.tolist()) if k]
+        super().__delitem__(slice(None))
+        super().extend(kept)
+        m = len(kept)
+        for column in (self.corner_x, self.corner_y, self.width, self.height, self.order):
+            column[:m] = column[:n][keep]
+
 
 # Bin structure
 class Bin:
@@ -50,14 +168,188 @@ class Bin:
         self.free_area = 0
         self.cost = 0
         self.id = 0
-        self.list_of_free_rec = []
+        self.list_of_free_rec = FreeRectangleList()
         self.list_of_items = []
+        # Edge maps of the free rectangles and the rectangles (by order) the next merge
+        # checks, only used by the guillotine algorithm
+        self.rec_by_bottom_edge = {}
+        self.rec_by_left_edge = {}
+        self.rec_by_top_edge = {}
+        self.rec_by_right_edge = {}
+        self.merge_pending = {}
+        # Longest short side and longest long side over the free rectangles
+        self.max_free_short = 0
+        self.max_free_long = 0
+
+
+# Items may be rotated, so a free rectangle holds an item iff its short side and its
+# long side are both at least the item's. The free list keeps both maxima as rectangles
+# are added and removed, so this does not scan it.
+def update_free_summary(car):
+    car.max_free_short = car.list_of_free_rec.max_short
+    car.max_free_long = car.list_of_free_rec.max_long
+
+
+# Segment tree over the bins in packing order. Every node keeps the largest free area,
+# free short side and free long side below it, so an item skips whole ranges of bins
+# that cannot hold it and only reaches best_ranking on bins that might. Entries are bins
+# or truck types; their free_area/max_free_short/max_free_long must be up to date
+# before they are added or updated.
+class BinIndex:
+    def __init__(self, entries):
+        self.entries = entries
+        self.rebuild()
+
+    def rebuild(self):
+        self.size = 1
+        while self.size < len(self.entries):
+            self.size *= 2
+        self.free_area = [0] * (2 * self.size)
+        self.max_short = [0] * (2 * self.size)
+        self.max_long = [0] * (2 * self.size)
+
+        for j, entry in enumerate(self.entries):
+            self.free_area[self.size + j] = entry.free_area
+            self.max_short[self.size + j] = entry.max_free_short
+            self.max_long[self.size + j] = entry.max_free_long
+        for node in range(self.size - 1, 0, -1):
+            self._pull(node)
+
+    def _pull(self, node):
+        left, right = 2 * node, 2 * node + 1
+        self.free_area[node] = max(self.free_area[left], self.free_area[right])
+        self.max_short[node] = max(self.max_short[left], self.max_short[right])
+        self.max_long[node] = max(self.max_long[left], self.max_long[right])
+
+    def update(self, j):
+        entry = self.entries[j]
+        node = self.size + j
+        self.free_area[node] = entry.free_area
+        self.max_short[node] = entry.max_free_short
+        self.max_long[node] = entry.max_free_long
+        node //= 2
+        while node:
+            self._pull(node)
+            node //= 2
+
+    def append(self, entry):
+        self.entries.append(entry)
+        if len(self.entries) > self.size:
+            self.rebuild()
+        else:
+            self.update(len(self.entries) - 1)
+
+    # Positions of the entries that may hold the item, in packing order
+    def candidates(self, pack):
+        short_side = min(pack.width, pack.height)
+        long_side = max(pack.width, pack.height)
+        stack = [1]
+        while stack:
+            node = stack.pop()
+            if (self.free_area[node] < pack.area or self.max_short[node] < short_side or
+                    self.max_long[node] < long_side):
+                continue
+            if node >= self.size:
+                if node - self.size < len(self.entries):
+                    yield node - self.size
+            else:
+                stack.append(2 * node + 1)
+                stack.append(2 * node)
+
+
+# Only guillotine bins keep their free rectangles in the edge maps
+def new_bin(width, height, cost, id, guillotine=False):
+    car = Bin()
+    car.width = width
+    car.height = height
+    car.cost = cost
+    car.area = car.width * car.height
+    car.id = id
+    car.free_area = car.area
+    first_rec = FreeRectangle()
+    first_rec.width = car.width
+    first_rec.height = car.height
+    first_rec.corner_x = 0
+    first_rec.corner_y = 0
+    first_rec.area = first_rec.width * first_rec.height
+    if guillotine:
+        add_free_rec_guillotine(car, first_rec)
+    else:
+        car.list_of_free_rec.append(first_rec)
+    update_free_summary(car)
+    return car
+
+
+# Identical trucks (same width, height and cost) that follow each other in packing order.
+# Only the copies that received items exist as Bin objects; the next copy is opened when
+# an item fits none of them, so memory and scanning follow the number of truck types
+# instead of the number of trucks.
+class TruckType:
+    def __init__(self, width, height, cost, ids):
+        self.width = width
+        self.height = height
+        self.cost = cost
+        self.area = width * height
+        self.ids = ids
+        self.index = BinIndex([])
+        self.update_summary()
+
+    @property
+    def bins(self):
+        return self.index.entries
+
+    # Summary over the opened copies and, while copies are left, one empty copy
+    def update_summary(self):
+        self.free_area = self.index.free_area[1]
+        self.max_free_short = self.index.max_short[1]
+        self.max_free_long = self.index.max_long[1]
+        if len(self.bins) < len(self.ids):
+            self.free_area = max(self.free_area, self.area)
+            self.max_free_short = max(self.max_free_short, min(self.width, self.height))
+            self.max_free_long = max(self.max_free_long, max(self.width, self.height))
+
+    def insert(self, pack, insert_item, placement):
+        for j in self.index.candidates(pack):
+            if insert_item(self.bins[j], pack, placement):
+                update_free_summary(self.bins[j])
+                self.index.update(j)
+                self.update_summary()
+                return True
+
+        # An empty copy holds the item iff its sides are long enough
+        if (len(self.bins) < len(self.ids) and min(self.width, self.height) >= min(pack.width, pack.height) and
+                max(self.width, self.height) >= max(pack.width, pack.height)):
+            car = new_bin(self.width, self.height, self.cost, self.ids[len(self.bins)],
+                          guillotine=insert_item is insert_item_guillotine)
+            insert_item(car, pack, placement)
+            update_free_summary(car)
+            self.index.append(car)
+            self.update_summary()
+            return True
+        return False
 
 
-# Initialize arrays
-item = [Item() for _ in range(MAXN)]
-item_guillotine = [Item() for _ in range(MAXN)]
-bin = [Bin() for _ in range(MAXN)]
+# Group the trucks into TruckType runs, in the order a stable sort by key would give.
+# Different trucks can share a key (W x H and H x W at the same cost); their copies
+# are then interleaved by truck number, as in the sorted list of trucks.
+def build_truck_types(trucks, key):
+    groups = {}
+    for j, truck in enumerate(trucks, start=1):
+        groups.setdefault(truck, []).append(j)
+    types = [TruckType(width, height, cost, ids) for (width, height, cost), ids in groups.items()]
+    types.sort(key=lambda x: (key(x), x.ids[0]))
+
+    runs = []
+    for _, block in itertools.groupby(types, key=key):
+        block = list(block)
+        if len(block) == 1:
+            runs.append(block[0])
+            continue
+        owners = sorted((j, b) for b, truck_type in enumerate(block) for j in truck_type.ids)
+        for b, run in itertools.groupby(owners, key=lambda x: x[1]):
+            truck_type = block[b]
+            runs.append(TruckType(truck_type.width, truck_type.height, truck_type.cost, [j for j, _ in run]))
+    return runs
 
 
 # Comparison functions
@@ -125,10 +417,68 @@ def score_rec(rec, pack, rotated):
     return (short_side, long_side)
 
 
+# Placement rules: every score is a pair compared with compare_ranking_rec_BSS, lower is better
+def score_rec_best_short_side(car, rec, pack, rotated):
+    return score_rec(rec, pack, rotated)
+
+
+def score_rec_best_long_side(car, rec, pack, rotated):
+    short_side, long_side = score_rec(rec, pack, rotated)
+    return (long_side, short_side)
+
+
+def score_rec_best_area(car, rec, pack, rotated):
+    return (rec.width * rec.height - pack.area, score_rec(rec, pack, rotated)[0])
+
+
+def score_rec_bottom_left(car, rec, pack, rotated):
+    height = pack.width if rotated else pack.height
+    return (rec.corner_y + height, rec.corner_x)
+
+
+def common_length(start_a, end_a, start_b, end_b):
+    return max(0, min(end_a, end_b) - max(start_a, start_b))
+
+
+# Length of the item's perimeter touching the bin walls or items already in the bin
+def score_rec_contact_point(car, rec, pack, rotated):
+    width, height = (pack.height, pack.width) if rotated else (pack.width, pack.height)
+    x, y = rec.corner_x, rec.corner_y
+    contact = 0
+    if x == 0:
+        contact += height
+    if x + width == car.width:
+        contact += height
+    if y == 0:
+        contact += width
+    if y + height == car.height:
+        contact += width
+    for placed in car.list_of_items:
+        if placed.corner_x + placed.width == x or x + width == placed.corner_x:
+            contact += common_length(placed.corner_y, placed.corner_y + placed.height, y, y + height)
+        if placed.corner_y + placed.height == y or y + height == placed.corner_y:
+            contact += common_length(placed.corner_x, placed.corner_x + placed.width, x, x + width)
+    return (-contact, score_rec(rec, pack, rotated)[0])
+
+
+PLACEMENT_RULES = {
+    'best_short_side': score_rec_best_short_side,
+    'best_long_side': score_rec_best_long_side,
+    'best_area': score_rec_best_area,
+    'bottom_left': score_rec_bottom_left,
+    'contact_point': score_rec_contact_point,
+}
+
+
 # Find best free rectangle for item
-def best_ranking(car, pack):
+def best_ranking(car, pack, placement='best_short_side'):
+    if placement != 'best_short_side':
+        return best_ranking_by_rule(car, pack, PLACEMENT_RULES[placement])
+    if len(car.list_of_free_rec) >= VECTORIZE_MIN_FREE_REC:
+        return best_ranking_vectorized(car, pack)
+
     rotated = False
-    best_rec = FreeRectangle()
+    best_rec = None
     best_pos = 0
     check_exist = False
     best_score = (INF, INF)
@@ -154,30 +504,57 @@ def best_ranking(car, pack):
     return ((best_rec, best_pos), (rotated, check_exist))
 
 
-# Calculate solution
-def calculate_solution():
-    global total_cost, bin_used
-    total_cost = 0
-    bin_used = 0
+# Same loop as best_ranking with another placement rule
+def best_ranking_by_rule(car, pack, score_fn):
+    rotated = False
+    best_rec = None
+    best_pos = 0
+    check_exist = False
+    best_score = (INF, INF)
 
-    for j in range(1, N_bins + 1):
-        if len(bin[j].list_of_items) > 0:
-            total_cost += bin[j].cost
-            bin_used += 1
+    for i, rec in enumerate(car.list_of_free_rec):
+        for rotation in (False, True):
+            if check_fit_rec(rec, pack, rotation):
+                score = score_fn(car, rec, pack, rotation)
+                if compare_ranking_rec_BSS(score, best_score):
+                    best_score = score
+                    best_rec = rec
+                    best_pos = i
+                    rotated = rotation
+                    check_exist = True
 
-    return (total_cost, bin_used)
+    return ((best_rec, best_pos), (rotated, check_exist))
 
 
-# Check status (output results)
-def checking_status(algorithm):
-    if algorithm:
-        sorted_items = sorted(item[1:N_items + 1], key=lambda x: x.id)
-        for pack in sorted_items:
-            print(f"{pack.id} {pack.pos_bin} {pack.corner_x} {pack.corner_y} {int(pack.rotated)}")
-    else:
-        sorted_items = sorted(item_guillotine[1:N_items + 1], key=lambda x: x.id)
-        for pack in sorted_items:
-            print(f"{pack.id} {pack.pos_bin} {pack.corner_x} {pack.corner_y} {int(pack.rotated)}")
+# Same ranking as best_ranking, computed over the columnar arrays in one argmin.
+# Scores are laid out as (rec 0, rec 0 rotated, rec 1, ...) so ties go to the
+# candidate the loop would have met first.
+def best_ranking_vectorized(car, pack):
+    recs = car.list_of_free_rec
+    n = len(recs)
+    if n == 0:
+        return ((None, 0), (False, False))
+    width = recs.width[:n]
+    height = recs.height[:n]
+
+    leftover_w = np.empty((n, 2), dtype=np.int64)
+    leftover_h = np.empty((n, 2), dtype=np.int64)
+    leftover_w[:, 0] = width - pack.width
+    leftover_h[:, 0] = height - pack.height
+    leftover_w[:, 1] = width - pack.height
+    leftover_h[:, 1] = height - pack.width
+
+    short_side = np.minimum(leftover_w, leftover_h)
+    long_side = np.maximum(leftover_w, leftover_h)
+    # (short, long) compared lexicographically; long side never exceeds the largest rectangle side
+    key = short_side * (max(int(width.max()), int(height.max())) + 1) + long_side
+    key[short_side < 0] = np.iinfo(np.int64).max
+
+    best = int(np.argmin(key))
+    if short_side.flat[best] < 0:
+        return ((None, 0), (False, False))
+    best_pos, rotated = divmod(best, 2)
+    return ((recs[best_pos], best_pos), (bool(rotated), True))
 
 
 # Guillotine Algorithm
@@ -217,63 +594,87 @@ def spliting_guillotine(rec, pack):
     return spliting_process_guillotine(rec.width <= rec.height, rec, pack)
 
 
+# Guillotine free rectangles never overlap, so a bottom edge (corner_x, width, corner_y),
+# a left edge (corner_y, height, corner_x), a top edge (corner_x, width, top) or a right
+# edge (corner_y, height, right) belongs to at most one of them. A rectangle merges with
+# the one whose bottom edge is its top edge or whose left edge is its right edge.
+def add_free_rec_guillotine(car, rec):
+    car.list_of_free_rec.append(rec)
+    bottom = (rec.corner_x, rec.width, rec.corner_y)
+    left = (rec.corner_y, rec.height, rec.corner_x)
+    car.rec_by_bottom_edge[bottom] = rec
+    car.rec_by_left_edge[left] = rec
+    car.rec_by_top_edge[(rec.corner_x, rec.width, rec.corner_y + rec.height)] = rec
+    car.rec_by_right_edge[(rec.corner_y, rec.height, rec.corner_x + rec.width)] = rec
+
+    # Only the new rectangle and those it is the top or right neighbour of can now merge
+    car.merge_pending[rec.order] = rec
+    for other in (car.rec_by_top_edge.get(bottom), car.rec_by_right_edge.get(left)):
+        if other is not None:
+            car.merge_pending[other.order] = other
+
+
+def remove_free_rec_guillotine(car, pos):
+    rec = car.list_of_free_rec[pos]
+    del car.list_of_free_rec[pos]
+    del car.rec_by_bottom_edge[(rec.corner_x, rec.width, rec.corner_y)]
+    del car.rec_by_left_edge[(rec.corner_y, rec.height, rec.corner_x)]
+    del car.rec_by_top_edge[(rec.corner_x, rec.width, rec.corner_y + rec.height)]
+    del car.rec_by_right_edge[(rec.corner_y, rec.height, rec.corner_x + rec.width)]
+    car.merge_pending.pop(rec.order, None)
+
+
+# Same merges as one pass over the free list in list order, but only the pending rectangles
+# are visited: the others had no neighbour to merge with when last visited and none was
+# added since. A rectangle that gets one after the pass went by it waits for the next merge.
 def merge_rec_guillotine(car):
-    i = 0
-    while i < len(car.list_of_free_rec):
-        first = car.list_of_free_rec[i]
-        check_exist_width = False
-        check_exist_height = False
-        pos_check_width = 0
-        pos_check_height = 0
-
-        for j in range(len(car.list_of_free_rec)):
-            if j == i:
-                continue
-            second = car.list_of_free_rec[j]
-            if (first.width == second.width and first.corner_x == second.corner_x and
-                    second.corner_y == first.corner_y + first.height):
-                check_exist_width = True
-                pos_check_width = j
-                break
-            if (first.height == second.height and first.corner_y == second.corner_y and
-                    second.corner_x == first.corner_x + first.width):
-                check_exist_height = True
-                pos_check_height = j
-                break
-
-        if check_exist_width:
-            merged_rec = FreeRectangle()
+    recs = car.list_of_free_rec
+    pending = car.merge_pending
+    queue = list(pending)
+    heapq.heapify(queue)
+    passed = -1
+    while queue:
+        order = heapq.heappop(queue)
+        if order <= passed or order not in pending:
+            continue
+        passed = order
+        first = pending.pop(order)
+        # Neighbour on top with the same width, or on the right with the same height
+        top = car.rec_by_bottom_edge.get((first.corner_x, first.width, first.corner_y + first.height))
+        right = car.rec_by_left_edge.get((first.corner_y, first.height, first.corner_x + first.width))
+        if top is None and right is None:
+            continue
+
+        # When both exist, merge with the one that comes first in the list
+        merged_rec = FreeRectangle()
+        merged_rec.corner_x = first.corner_x
+        merged_rec.corner_y = first.corner_y
+        if right is None or (top is not None and top.order < right.order):
+            other = top
             merged_rec.width = first.width
-            merged_rec.height = first.height + car.list_of_free_rec[pos_check_width].height
-            merged_rec.area = merged_rec.width * merged_rec.height
-            merged_rec.corner_x = first.corner_x
-            merged_rec.corner_y = first.corner_y
-            del car.list_of_free_rec[pos_check_width]
-            if pos_check_width < i:
-                i -= 1
-            del car.list_of_free_rec[i]
-            i -= 1
-            car.list_of_free_rec.append(merged_rec)
-
-        elif check_exist_height:
-            merged_rec = FreeRectangle()
-            merged_rec.width = first.width + car.list_of_free_rec[pos_check_height].width
+            merged_rec.height = first.height + top.height
+        else:
+            other = right
+            merged_rec.width = first.width + right.width
             merged_rec.height = first.height
-            merged_rec.area = merged_rec.width * merged_rec.height
-            merged_rec.corner_x = first.corner_x
-            merged_rec.corner_y = first.corner_y
-            del car.list_of_free_rec[pos_check_height]
-            if pos_check_height < i:
-                i -= 1
-            del car.list_of_free_rec[i]
-            i -= 1
-            car.list_of_free_rec.append(merged_rec)
+        merged_rec.area = merged_rec.width * merged_rec.height
 
-        i += 1
+        remove_free_rec_guillotine(car, recs.position(other))
+        remove_free_rec_guillotine(car, recs.position(first))
+        add_free_rec_guillotine(car, merged_rec)
 
+        # Of the rectangles that became pending, those the pass has not reached yet are
+        # visited in this merge
+        below = car.rec_by_top_edge.get((merged_rec.corner_x, merged_rec.width, merged_rec.corner_y))
+        left = car.rec_by_right_edge.get((merged_rec.corner_y, merged_rec.height, merged_rec.corner_x))
+        heapq.heappush(queue, merged_rec.order)
+        for rec in (below, left):
+            if rec is not None and rec.order > passed:
+                heapq.heappush(queue, rec.order)
 
-def insert_item_guillotine(car, pack):
-    best_ranking_return = best_ranking(car, pack)
+
+def insert_item_guillotine(car, pack, placement='best_short_side'):
+    best_ranking_return = best_ranking(car, pack, placement)
 
     if not best_ranking_return[1][1]:
         return False
@@ -284,22 +685,15 @@ def insert_item_guillotine(car, pack):
     rotated = best_ranking_return[1][0]
 
     add_item(car, pack, rotated, best_rec.corner_x, best_rec.corner_y)
-    del car.list_of_free_rec[best_pos]
+    remove_free_rec_guillotine(car, best_pos)
 
-    new_rec = spliting_guillotine(best_rec, pack)
-    car.list_of_free_rec.extend(new_rec)
+    for rec in spliting_guillotine(best_rec, pack):
+        add_free_rec_guillotine(car, rec)
 
     merge_rec_guillotine(car)
     return True
 
 
-def solve_guillotine():
-    for i in range(1, N_items + 1):
-        for j in range(1, N_bins + 1):
-            if insert_item_guillotine(bin[j], item[i]):
-                break
-
-
 # Maximal Rectangles Algorithm
 def spliting_process_maxrec(rec, pack):
     list_of_free_rec = []
@@ -398,40 +792,61 @@ def check_covered_maxrec(rec_covering, rec_covered):
     return True
 
 
-def remove_covered_rec_maxrec(car):
-    i = 0
-    while i < len(car.list_of_free_rec):
-        first = car.list_of_free_rec[i]
-        j = i + 1
-        while j < len(car.list_of_free_rec):
-            second = car.list_of_free_rec[j]
-            if check_covered_maxrec(first, second):
-                del car.list_of_free_rec[j]
-                continue
-            if check_covered_maxrec(second, first):
-                del car.list_of_free_rec[i]
-                i -= 1
-                break
-            j += 1
-        i += 1
-
-
-def remove_overlap_maxrec(car, pack):
-    i = 0
-    while i < len(car.list_of_free_rec):
-        rec = car.list_of_free_rec[i]
-        if check_intersec_maxrec(rec, pack):
-            overlap_rec = find_overlap_maxrec(rec, pack)
-            new_rec = split_intersect_maxrec(rec, overlap_rec)
-            del car.list_of_free_rec[i]
-            car.list_of_free_rec.extend(new_rec)
-            i -= 1
-        i += 1
-    remove_covered_rec_maxrec(car)
-
-
-def insert_item_maxrec(car, pack):
-    best_ranking_return = best_ranking(car, pack)
+# Rectangles before first_new are already free of containment among themselves, so only
+# the new ones are checked against the whole list. Exact duplicates are dropped through
+# hashing, keeping the earliest copy.
+def remove_covered_rec_maxrec(car, first_new=0):
+    recs = car.list_of_free_rec
+    n = len(recs)
+    seen = set(recs[:first_new])
+    new_pos = []
+    drop = set()
+    for j in range(first_new, n):
+        if recs[j] in seen:
+            drop.add(j)
+        else:
+            seen.add(recs[j])
+            new_pos.append(j)
+
+    for j in new_pos:
+        rec = recs[j]
+        if n >= VECTORIZE_MIN_FREE_REC:
+            covering, covered = recs.containment(rec)
+        else:
+            covering = [i for i in range(n) if check_covered_maxrec(recs[i], rec)]
+            covered = [i for i in range(n) if check_covered_maxrec(rec, recs[i])]
+        # Equal rectangles show up in both lists, they were settled by the hash check
+        if any(recs[i] != rec for i in covering):
+            drop.add(j)
+        for i in covered:
+            if i < first_new and recs[i] != rec:
+                drop.add(i)
+
+    recs.delete_many(sorted(drop))
+
+
+# n_new rectangles at the end of the list were added by this insertion and are not
+# checked for intersection; they never overlap the item
+def remove_overlap_maxrec(car, pack, n_new=0):
+    recs = car.list_of_free_rec
+    old = len(recs) - n_new
+    if old >= VECTORIZE_MIN_FREE_REC:
+        positions = recs.intersecting(pack)
+    else:
+        positions = [i for i in range(old) if check_intersec_maxrec(recs[i], pack)]
+
+    # The pieces never intersect the item again, so they can be added after all splits
+    new_rec = []
+    for i in positions:
+        overlap_rec = find_overlap_maxrec(recs[i], pack)
+        new_rec.extend(split_intersect_maxrec(recs[i], overlap_rec))
+    recs.delete_many(positions)
+    recs.extend(new_rec)
+    remove_covered_rec_maxrec(car, old - len(positions))
+
+
+def insert_item_maxrec(car, pack, placement='best_short_side'):
+    best_ranking_return = best_ranking(car, pack, placement)
 
     if not best_ranking_return[1][1]:
         return False
@@ -447,104 +862,187 @@ def insert_item_maxrec(car, pack):
     new_rec = spliting_process_maxrec(best_rec, pack)
     car.list_of_free_rec.extend(new_rec)
 
-    remove_overlap_maxrec(car, pack)
+    remove_overlap_maxrec(car, pack, len(new_rec))
     return True
 
 
-def solve_maxrec():
-    for i in range(1, N_items + 1):
-        for j in range(1, N_bins + 1):
-            if insert_item_maxrec(bin[j], item[i]):
-                break
+# Problem instance
+class Instance:
+    """Item sizes (w, h) and truck sizes and costs (W, H, C) of one problem."""
+
+    def __init__(self, items, bins):
+        self.items = [tuple(size) for size in items]
+        self.bins = [tuple(truck) for truck in bins]
+
+    @property
+    def n_items(self):
+        return len(self.items)
+
+    @property
+    def n_bins(self):
+        return len(self.bins)
+
+    # Parses every integer of the stream in one pass; works on text and binary streams
+    @classmethod
+    def read(cls, stream):
+        values = list(map(int, stream.read().split()))
+        n_items, n_bins = values[0], values[1]
+        end_items = 2 + 2 * n_items
+        end_bins = end_items + 3 * n_bins
+        items = zip(values[2:end_items:2], values[3:end_items:2])
+        bins = zip(values[end_items:end_bins:3], values[end_items + 1:end_bins:3], values[end_items + 2:end_bins:3])
+        return cls(items, bins)
+
+    @classmethod
+    def from_file(cls, file_path):
+        with open(file_path, 'rb') as f:
+            return cls.read(f)
+
+
+# Packing result
+class Solution:
+    """Cost of a packing and the placement of every item, ordered by item id."""
+
+    def __init__(self, total_cost, bin_used, items, algorithm):
+        self.total_cost = total_cost
+        self.bin_used = bin_used
+        self.items = sorted(items, key=lambda x: x.id)
+        self.algorithm = algorithm
+        self.strategy = None
+
+    def placements(self):
+        for pack in self.items:
+            yield (pack.id, pack.pos_bin, pack.corner_x, pack.corner_y, int(pack.rotated))
+
+
+# Check status (output results), built in one buffer and written at once
+def checking_status(solution, stream=None):
+    stream = sys.stdout if stream is None else stream
+    stream.write(''.join(["%d %d %d %d %d\n" % placement for placement in solution.placements()]))
+
+
+# Item orders (items are stored with width <= height) and bin orders used by the packer
+ITEM_ORDERS = {
+    'height': lambda x: (-x.height, -x.width),
+    'width': lambda x: (-x.width, -x.height),
+    'area': lambda x: (-x.area, -x.height),
+    'perimeter': lambda x: (-(x.width + x.height), -x.height),
+}
+
+BIN_ORDERS = {
+    'cost_density': lambda x: (
+        x.cost / (x.width * x.height), -max(x.width, x.height), -min(x.width, x.height)),
+    'cost': lambda x: (x.cost, -x.area),
+    'area': lambda x: (-x.area, x.cost / x.area),
+}
+
+INSERT_FUNCTIONS = {
+    'guillotine': insert_item_guillotine,
+    'maxrec': insert_item_maxrec,
+}
+
+# One way of running the heuristic: algorithm, item order, bin order and placement rule
+Strategy = namedtuple('Strategy', ['algorithm', 'item_order', 'bin_order', 'placement'],
+                      defaults=['height', 'cost_density', 'best_short_side'])
+
+
+# Packer: holds all the state of one solve, so instances can be solved independently
+class Packer:
+    def __init__(self, instance):
+        self.instance = instance
+        self.items = []
+        self.types = []
+
+    def build(self, item_order='height', bin_order='cost_density'):
+        self.items = []
+        for i, (width, height) in enumerate(self.instance.items, start=1):
+            pack = Item()
+            pack.width = width
+            pack.height = height
+            if pack.width > pack.height:
+                rotate_item(pack)
+            pack.area = pack.width * pack.height
+            pack.id = i
+            self.items.append(pack)
+
+        self.items.sort(key=ITEM_ORDERS[item_order])
+        self.types = build_truck_types(self.instance.bins, BIN_ORDERS[bin_order])
+
+    def calculate_solution(self, algorithm):
+        total_cost = 0
+        bin_used = 0
+
+        for truck_type in self.types:
+            for car in truck_type.bins:
+                if len(car.list_of_items) > 0:
+                    total_cost += car.cost
+                    bin_used += 1
+
+        return Solution(total_cost, bin_used, self.items, algorithm)
+
+    # Put every item into the first bin, in packing order, that can hold it
+    def pack_items(self, insert_item, placement='best_short_side'):
+        index = BinIndex(self.types)
+        for pack in self.items:
+            for j in index.candidates(pack):
+                if self.types[j].insert(pack, insert_item, placement):
+                    index.update(j)
+                    break
+
+    def solve_strategy(self, strategy):
+        self.build(strategy.item_order, strategy.bin_order)
+        self.pack_items(INSERT_FUNCTIONS[strategy.algorithm], strategy.placement)
+        solution = self.calculate_solution(strategy.algorithm)
+        solution.strategy = strategy
+        return solution
+
+    def solve_guillotine(self):
+        return self.solve_strategy(Strategy('guillotine'))
+
+    def solve_maxrec(self):
+        return self.solve_strategy(Strategy('maxrec'))
+
+    def solve_algorithm(self, algorithm):
+        return self.solve_strategy(Strategy(algorithm))
+
+    # Both algorithms work on their own copy of the items and bins, so they can run in
+    # separate processes; the cheaper packing is kept
+    def solve(self, parallel=None):
+        if parallel is None:
+            parallel = self.instance.n_items >= PARALLEL_MIN_ITEMS and (os.cpu_count() or 1) > 1
+
+        if parallel:
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                guillotine_future = executor.submit(run_algorithm, self.instance, 'guillotine')
+                maxrec_future = executor.submit(run_algorithm, self.instance, 'maxrec')
+                guillotine_result = guillotine_future.result()
+                maxrec_result = maxrec_future.result()
+        else:
+            guillotine_result = self.solve_guillotine()
+            maxrec_result = self.solve_maxrec()
+
+        if guillotine_result.total_cost < maxrec_result.total_cost:
+            return guillotine_result
+        return maxrec_result
+
+
+# Worker entry points for process pools
+def run_algorithm(instance, algorithm):
+    return Packer(instance).solve_algorithm(algorithm)
+
+
+def run_strategy(instance, strategy):
+    return Packer(instance).solve_strategy(strategy)
+
+
+def solve(instance, parallel=None):
+    return Packer(instance).solve(parallel)
 
 
 # Main program
-def enter():
-    global N_items, N_bins
-    N_items, N_bins = map(int, input().split())
-
-    for i in range(1, N_items + 1):
-        item[i].width, item[i].height = map(int, input().split())
-        if item[i].width > item[i].height:
-            rotate_item(item[i])
-        item[i].area = item[i].width * item[i].height
-        item[i].id = i
-
-    for j in range(1, N_bins + 1):
-        bin[j].width, bin[j].height, bin[j].cost = map(int, input().split())
-        bin[j].area = bin[j].width * bin[j].height
-        bin[j].id = j
-        bin[j].free_area = bin[j].area
-        first_rec = FreeRectangle()
-        first_rec.width = bin[j].width
-        first_rec.height = bin[j].height
-        first_rec.corner_x = 0
-        first_rec.corner_y = 0
-        first_rec.area = first_rec.width * first_rec.height
-        bin[j].list_of_free_rec.append(first_rec)
-
-    item[1:N_items + 1] = sorted(item[1:N_items + 1], key=lambda x: (-x.height, -x.width))
-    bin[1:N_bins + 1] = sorted(bin[1:N_bins + 1], key=lambda x: (
-    x.cost / (x.width * x.height), -max(x.width, x.height), -min(x.width, x.height)))
-
-
-def reset():
-    global total_cost
-    total_cost = 0
-
-    for i in range(1, N_items + 1):
-        item_guillotine[i] = Item()
-        item_guillotine[i].width = item[i].width
-        item_guillotine[i].height = item[i].height
-        item_guillotine[i].area = item[i].area
-        item_guillotine[i].corner_x = item[i].corner_x
-        item_guillotine[i].corner_y = item[i].corner_y
-        item_guillotine[i].id = item[i].id
-        item_guillotine[i].pos_bin = item[i].pos_bin
-        item_guillotine[i].rotated = item[i].rotated
-        item[i].corner_x = 0
-        item[i].corner_y = 0
-
-    for j in range(1, N_bins + 1):
-        bin[j].free_area = bin[j].area
-        bin[j].list_of_items = []
-        bin[j].list_of_free_rec = []
-        first_rec = FreeRectangle()
-        first_rec.width = bin[j].width
-        first_rec.height = bin[j].height
-        first_rec.corner_x = 0
-        first_rec.corner_y = 0
-        first_rec.area = first_rec.width * first_rec.height
-        bin[j].list_of_free_rec.append(first_rec)
-
-
-def solve():
-    enter()
-    solve_guillotine()
-    guillotine_result = calculate_solution()
-
-    reset()
-
-    solve_maxrec()
-    maxrec_result = calculate_solution()
-
-    global check_algorithm, total_cost, bin_used
-    if guillotine_result[0] < maxrec_result[0]:
-        total_cost = guillotine_result[0]
-        bin_used = guillotine_result[1]
-    else:
-        total_cost = maxrec_result[0]
-        bin_used = maxrec_result[1]
-        check_algorithm = True
-
-
-def print_output():
-    checking_status(check_algorithm)
-
-
 def main():
-    solve()
-    print_output()
+    solution = solve(Instance.read(sys.stdin.buffer))
+    checking_status(solution)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+
+from heuristic import (BIN_ORDERS, INSERT_FUNCTIONS, ITEM_ORDERS, PLACEMENT_RULES, Instance, Strategy,
+                       checking_status, run_strategy)
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from common.lower_bounds import gap, lower_bound
+
+# Instance of the current portfolio, set once in every worker process
+worker_instance = None
+
+
+def init_worker(instance):
+    global worker_instance
+    worker_instance = instance
+
+
+def run_indexed_strategy(task):
+    index, strategy = task
+    return index, run_strategy(worker_instance, strategy)
+
+
+def default_strategies(algorithms=None, item_orders=None, bin_orders=None, placements=None):
+    '''
+        Return every combination of the given options, default heuristic first
+        (maxrec, then guillotine) so a short time limit still gets the usual result.
+    '''
+    algorithms = algorithms or ['maxrec', 'guillotine']
+    item_orders = item_orders or list(ITEM_ORDERS)
+    bin_orders = bin_orders or list(BIN_ORDERS)
+    placements = placements or list(PLACEMENT_RULES)
+
+    strategies = list(itertools.starmap(Strategy, itertools.product(algorithms, item_orders, bin_orders, placements)))
+    # Stable sort: the default strategy of each algorithm moves to the front
+    strategies.sort(key=lambda strategy: strategy != Strategy(strategy.algorithm))
+    return strategies
+
+
+def solve_portfolio(instance, strategies=None, time_limit=None, workers=None, bound=0, gap_limit=0):
+    '''
+        Run the strategies across a process pool and return the cheapest packing
+        finished within time_limit seconds (ties go to the earlier strategy).
+        If nothing has finished by then, wait for the first packing.
+        Stop early once a packing is within gap_limit of the lower bound.
+    '''
+    strategies = strategies or default_strategies()
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+
+    best = None
+    best_index = None
+    # Leaving the with block terminates the workers still running
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(instance,)) as pool:
+        results = pool.imap_unordered(run_indexed_strategy, list(enumerate(strategies)))
+        while True:
+            timeout = None
+            if deadline is not None and best is not None:
+                timeout = max(0.0, deadline - time.monotonic())
+            try:
+                index, solution = results.next(timeout)
+            except (StopIteration, multiprocessing.TimeoutError):
+                break
+            if best is None or (solution.total_cost, index) < (best.total_cost, best_index):
+                best = solution
+                best_index = index
+            if gap(best.total_cost, bound) <= gap_limit:
+                break
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a portfolio of heuristic strategies on an instance read from stdin.')
+    parser.add_argument('--time-limit', type=float, default=10, help='wall-clock budget in seconds')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all CPUs)')
+    parser.add_argument('--algorithms', nargs='+', choices=list(INSERT_FUNCTIONS))
+    parser.add_argument('--item-orders', nargs='+', choices=list(ITEM_ORDERS))
+    parser.add_argument('--bin-orders', nargs='+', choices=list(BIN_ORDERS))
+    parser.add_argument('--placements', nargs='+', choices=list(PLACEMENT_RULES))
+    parser.add_argument('--gap', type=float, default=0,
+                        help='stop once a packing is within this relative gap of the lower bound')
+    args = parser.parse_args()
+
+    instance = Instance.read(sys.stdin.buffer)
+    bound = lower_bound(instance.items, instance.bins)
+    strategies = default_strategies(args.algorithms, args.item_orders, args.bin_orders, args.placements)
+    solution = solve_portfolio(instance, strategies, args.time_limit, args.workers, bound, args.gap)
+
+    print(f'Total cost: {solution.total_cost} ({len(strategies)} strategies, best {tuple(solution.strategy)}), '
+          f'lower bound {bound} (gap {gap(solution.total_cost, bound):.2%})', file=sys.stderr)
+    checking_status(solution)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,31 @@
 from ortools.linear_solver import pywraplp
+import argparse
 import sys
+import time
 import psutil
 import os
 
-def input_data(file_path):
-    data = {}
-    f = open(file_path,'r')
-    [n,k] =[int(x) for x in f.readline().split()]
-    data['size_item'] = []
-    data['size_truck'] = []
-    data['cost'] = []
-    
-    for i in range(1,n+1):
-        line = f.readline().split()
-        data['size_item'].append([int(line[0]),int(line[1])])
-        # w[i] = data['size_item'][i][0]
-        # h[i] = data['size_item'][i][1]
-
-    for i in range(k):
-        line = f.readline().split()
-        data['size_truck'].append([int(line[0]),int(line[1])])
-        data['cost'].append(int(line[2]))
-    
-    W_truck = [data['size_truck'][i][0] for i in range(k)]
-    H_truck = [data['size_truck'][i][1] for i in range(k)]
-    return n,k,data,W_truck,H_truck
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.loader import load
+from common.lower_bounds import gap, lower_bound
+from common.model_cache import CACHE_DIR, instance_hash, load_mip_model, save_mip_model
+from common.presolve import fits
+from common.truck_types import group_trucks, truck_copies
+from common.warm_start import heuristic_start
 
-if __name__ == '__main__':
-    process = psutil.Process(os.getpid())
-
-    # Đo bộ nhớ trước khi giải
-    mem_before = process.memory_info().rss / 1024 / 1024  # Chuyển sang MB
-    try:
-        # Get input file path
-        file_path = sys.argv[1]
-    except IndexError:
-        # Default input file if file path is not specified
-        file_path = '/2D-bin-packing-problem/input_data/0010.txt'
-    
-    try:
-        # Get input file path
-        time_limit = int(sys.argv[2])
-    except IndexError:
-        # Default input file if file path is not specified
-        time_limit = 300
+def input_data(file_path):
+    # n, k, data (size_item, size_truck, cost) and the width and length of every car
+    return load(file_path).to_data()
 
-    n,k,data,W_truck,H_truck = input_data(file_path)
-    # W_truck is the list of width of cars
-    # H_truck is the list of length of cars
-    # n is the number of item
-    # k is the number of car
-    
+def build_model_bigm(solver, n, k, data, W_truck, H_truck):
+    '''
+        Big-M formulation: every item is kept inside its car with M = 1000000, and
+        every item pair gets separation binaries e, c1..c4 for every car.
+        Return the variables; separation[(i,j,m)] = (e, c1, c2, c3, c4).
+    '''
     max_W = max(W_truck)
     max_H = max(H_truck) 
 
-    # Create solver
-    solver = pywraplp.Solver.CreateSolver('SCIP')
-    
     # Create variables
     M = 1000000
 
@@ -95,6 +64,7 @@ if __name__ == '__main__':
 
 
     # if 2 items is packed in the same car, they must be not overlaped
+    separation = {} # separation[(i,j,m)] = (e, c1, c2, c3, c4), kept for the warm start
     for i in range(n - 1):
         for j in range(i + 1, n):
             for m in range(k):
@@ -117,29 +87,248 @@ if __name__ == '__main__':
 
                 solver.Add(c1 + c2 + c3 + c4 + (1-e)*M >= 1 )
                 solver.Add(c1 + c2 + c3 + c4 <= e*M )
+                separation[(i,j,m)] = (e, c1, c2, c3, c4)
 
     # find cars be used
     z = {} # z[m] = 1 iff car m be used
+    q = {} # q[m] = number of items packed in car m
     for m in range(k):
         z[m] = solver.IntVar(0, 1, 'z[%i] ' %m)
         # if sum(x[i][m]) >= 1 then car m be used => z[m] = 1
         # else, z[m] = 0
 
-        q = solver.IntVar(0,n,f'q[{m}]')
-        solver.Add(q == sum(x[(i,m)] for i in range(n)))
+        q[m] = solver.IntVar(0,n,f'q[{m}]')
+        solver.Add(q[m] == sum(x[(i,m)] for i in range(n)))
         # car m be used iff there are at least 1 item be packed in car m, so sum(x[(i,m)] for i in range(n)) != 0 
         
         # q = 0 => z[m] = 0
         # q != 0 => z[m] = 1
-        solver.Add(z[m] <= q * M)
-        solver.Add(q <= z[m] * M)
+        solver.Add(z[m] <= q[m] * M)
+        solver.Add(q[m] <= z[m] * M)
+
+    return x, Ro, l, r, t, b, z, q, separation
+
+
+def build_model_compact(solver, n, k, data, W_truck, H_truck):
+    '''
+        Compact formulation: x only for the cars an item fits, the right and top of an
+        item bounded by the sides of its car, and one set of separation binaries
+        c1..c4 per item pair, switched on by s = 1 iff both items are in the same car.
+        Return the variables; separation[(i,j)] = (s, c1, c2, c3, c4).
+    '''
+    x = {} # x[(i,m)] = 1 iff item i is packed in car m, only for cars item i fits
+    Ro = {} # if Ro = 1 then rotation = 90 degree, else 0
+    l = {} # left coordination of item
+    r = {} # right coordination of item
+    t = {} # top coordination of item
+    b = {} # bottom coodination of item
+    max_W = {} # widest car item i fits, bounds its coordinates
+    max_H = {} # highest car item i fits
+
+    for i in range(n):
+        w, h = data['size_item'][i]
+        for m in range(k):
+            if fits((w, h), (W_truck[m], H_truck[m])):
+                x[(i,m)] = solver.IntVar(0, 1, 'x_[%i]_[%i]' %(i,m))
+        cars = [m for m in range(k) if (i,m) in x]
+        max_W[i] = max((W_truck[m] for m in cars), default=0)
+        max_H[i] = max((H_truck[m] for m in cars), default=0)
+
+        Ro[i] = solver.IntVar(0, 1, 'Ro[%i] '%i)
+        l[i] = solver.IntVar(0, max_W[i],'l[%i]' % i)
+        r[i] = solver.IntVar(0, max_W[i],'r[%i]' % i)
+        t[i] = solver.IntVar(0, max_H[i],'t[%i]' % i)
+        b[i] = solver.IntVar(0, max_H[i],'b[%i]' % i)
+        solver.Add(r[i] == (1-Ro[i]) * w + Ro[i] * h + l[i])
+        solver.Add(t[i] == (1-Ro[i]) * h + Ro[i] * w + b[i])
+
+        solver.Add(sum(x[(i,m)] for m in cars) == 1)
+        # item i must not exceed its car: x selects the sides of that car
+        solver.Add(r[i] <= sum(W_truck[m] * x[(i,m)] for m in cars))
+        solver.Add(t[i] <= sum(H_truck[m] * x[(i,m)] for m in cars))
+
+    # if 2 items is packed in the same car (s = 1), they must be not overlaped
+    separation = {} # separation[(i,j)] = (s, c1, c2, c3, c4), kept for the warm start
+    for i in range(n - 1):
+        for j in range(i + 1, n):
+            common = [m for m in range(k) if (i,m) in x and (j,m) in x]
+            if not common:
+                continue
+            s = solver.IntVar(0, 1, f's[{i}][{j}]')
+            for m in common:
+                solver.Add(s >= x[i,m] + x[j,m] - 1)
+
+            c1 = solver.IntVar(0, 1, f'c1[{i}][{j}]')
+            c2 = solver.IntVar(0, 1, f'c2[{i}][{j}]')
+            c3 = solver.IntVar(0, 1, f'c3[{i}][{j}]')
+            c4 = solver.IntVar(0, 1, f'c4[{i}][{j}]')
+
+            # the coordinates are within the cars the items fit, so these bound M
+            solver.Add(r[i] <= l[j] + max_W[i] * (1 - c1))
+            solver.Add(r[j] <= l[i] + max_W[j] * (1 - c2))
+            solver.Add(t[i] <= b[j] + max_H[i] * (1 - c3))
+            solver.Add(t[j] <= b[i] + max_H[j] * (1 - c4))
+            solver.Add(c1 + c2 + c3 + c4 >= s)
+            separation[(i,j)] = (s, c1, c2, c3, c4)
+
+    # find cars be used
+    z = {} # z[m] = 1 iff car m be used
+    for m in range(k):
+        z[m] = solver.IntVar(0, 1, 'z[%i] ' %m)
+        items = [i for i in range(n) if (i,m) in x]
+        for i in items:
+            solver.Add(x[(i,m)] <= z[m])
+        # the items of a car fit in its area
+        solver.Add(sum(data['size_item'][i][0] * data['size_item'][i][1] * x[(i,m)] for i in items)
+                   <= W_truck[m] * H_truck[m] * z[m])
+    return x, Ro, l, r, t, b, z, {}, separation
+
+
+MODELS = {
+    'bigm': build_model_bigm,
+    'compact': build_model_compact,
+}
+
+
+def first_feasible(model, n, k, data, W_truck, H_truck, time_limit):
+    '''
+        Build a formulation and solve it until the first feasible solution, without a
+        warm start. Return its number of variables and constraints, build time,
+        time to the first feasible solution (None if not found) and status.
+    '''
+    solver = pywraplp.Solver.CreateSolver('SCIP')
+    build_start = time.perf_counter()
+    x, Ro, l, r, t, b, z, q, separation = MODELS[model](solver, n, k, data, W_truck, H_truck)
+    solver.Minimize(sum(z[m]*data['cost'][m] for m in range(k)))
+    build_time = time.perf_counter() - build_start
+    solver.SetSolverSpecificParametersAsString('limits/solutions = 1\n')
+    solver.set_time_limit(int(time_limit * 1000))
+    # Timed here: WallTime counts from the creation of the solver, build included
+    solve_start = time.perf_counter()
+    status = solver.Solve()
+    solve_time = time.perf_counter() - solve_start
+    found = status == pywraplp.Solver.OPTIMAL or status == pywraplp.Solver.FEASIBLE
+    return solver.NumVariables(), solver.NumConstraints(), build_time, solve_time if found else None, status
+
+
+if __name__ == '__main__':
+    process = psutil.Process(os.getpid())
+
+    # Đo bộ nhớ trước khi giải
+    mem_before = process.memory_info().rss / 1024 / 1024  # Chuyển sang MB
+    parser = argparse.ArgumentParser(description='MIP model for the truck packing problem.')
+    # Default input file and time limit if they are not specified
+    parser.add_argument('file_path', nargs='?', default='/2D-bin-packing-problem/input_data/0010.txt')
+    parser.add_argument('time_limit', nargs='?', type=int, default=300)
+    parser.add_argument('--no-warm-start', dest='warm_start', action='store_false',
+                        help='do not hint the heuristic packing to the solver')
+    parser.add_argument('--gap', type=float, default=0,
+                        help='stop once the cost is within this relative gap of the lower bound')
+    parser.add_argument('--model', choices=list(MODELS), default='bigm',
+                        help='bigm: separation binaries per item pair and car; compact: per item pair')
+    parser.add_argument('--cache', dest='cache_dir', nargs='?', const=CACHE_DIR, metavar='DIR',
+                        help=f'load the model from DIR if built before, else save it there (default {CACHE_DIR})')
+    parser.add_argument('--compare', action='store_true',
+                        help='only report size and time to the first feasible solution of every formulation')
+    args = parser.parse_args()
+    file_path = args.file_path
+    time_limit = args.time_limit
+
+    n,k,data,W_truck,H_truck = input_data(file_path)
+
+    # identical cars are grouped into types, no type needs more than n copies
+    copies = truck_copies(group_trucks(zip(W_truck, H_truck, data['cost'])), n)
+    k = len(copies)
+    truck_id = [copy[0] for copy in copies]
+    W_truck = [copy[1] for copy in copies]
+    H_truck = [copy[2] for copy in copies]
+    data['cost'] = [copy[3] for copy in copies]
+    # W_truck is the list of width of cars
+    # H_truck is the list of length of cars
+    # n is the number of item
+    # k is the number of car
+
+    if args.compare:
+        print(f'{"model":<10}{"variables":>12}{"constraints":>13}{"build (s)":>11}{"first feasible (s)":>20}')
+        for model in MODELS:
+            n_vars, n_cons, build_time, first_time, status = first_feasible(model, n, k, data, W_truck, H_truck, time_limit)
+            first = f'{first_time:.3f}' if first_time is not None else f'none ({status})'
+            print(f'{model:<10}{n_vars:>12}{n_cons:>13}{build_time:>11.3f}{first:>20}')
+        sys.exit(0)
+
+    # Create solver, or load the model built before for the same instance
+    names = ['x', 'Ro', 'l', 'r', 't', 'b', 'z', 'q', 'separation']
+    key = instance_hash(args.model, data['size_item'], [copy[1:] for copy in copies])
+    load_start = time.perf_counter()
+    cached = load_mip_model(args.cache_dir, key) if args.cache_dir else None
+    build_time, load_time = 0, 0
+    if cached is not None:
+        solver, variables, _ = cached
+        x, Ro, l, r, t, b, z, q, separation = (variables[name] for name in names)
+        load_time = time.perf_counter() - load_start
+    else:
+        solver = pywraplp.Solver.CreateSolver('SCIP')
+        build_start = time.perf_counter()
+        x, Ro, l, r, t, b, z, q, separation = MODELS[args.model](solver, n, k, data, W_truck, H_truck)
+        build_time = time.perf_counter() - build_start
+        if args.cache_dir:
+            save_mip_model(args.cache_dir, key, solver, dict(zip(names, (x, Ro, l, r, t, b, z, q, separation))))
+    print(f'Model               : {args.model}, {solver.NumVariables()} variables, '
+          f'{solver.NumConstraints()} constraints')
+    print(f'Build time          : {build_time:.3f} s')
+    print(f'Load time           : {load_time:.3f} s')
 
     # objective
     cost = sum(z[m]*data['cost'][m] for m in range(k))
     solver.Minimize(cost)
+
+    # warm start: hint the heuristic packing, its cost is an upper bound of the objective
+    # SCIP ignores a hint that leaves most variables unknown, so every variable is hinted
+    start = heuristic_start(data['size_item'], [copy[1:] for copy in copies]) if args.warm_start else None
+    if start is not None:
+        hint_vars, hint_values = [], []
+        corners = []
+        for i, (car, left, bottom, rotated) in enumerate(start.placements):
+            w, h = data['size_item'][i][rotated], data['size_item'][i][1 - rotated]
+            corners.append((left, bottom, left + w, bottom + h))
+            hint_vars += [Ro[i], l[i], r[i], b[i], t[i]]
+            hint_values += [rotated, left, left + w, bottom, bottom + h]
+            for m in range(k):
+                if (i,m) in x:
+                    hint_vars.append(x[(i,m)])
+                    hint_values.append(int(m == car))
+        for key, (e, c1, c2, c3, c4) in separation.items():
+            # bigm: both items in car key[2]; compact: both items in the same car
+            i, j = key[:2]
+            car = start.placements[i][0]
+            both = int(car == start.placements[j][0] and key[2:] in ((), (car,)))
+            l_i, b_i, r_i, t_i = corners[i]
+            l_j, b_j, r_j, t_j = corners[j]
+            hint_vars += [e, c1, c2, c3, c4]
+            hint_values += [both, both * (r_i <= l_j), both * (r_j <= l_i), both * (t_i <= b_j), both * (t_j <= b_i)]
+        for m in range(k):
+            hint_vars.append(z[m])
+            hint_values.append(int(m in start.used_trucks))
+            if m in q:
+                hint_vars.append(q[m])
+                hint_values.append(sum(1 for p in start.placements if p[0] == m))
+        solver.SetHint(hint_vars, hint_values)
+        solver.Add(cost <= start.cost)
+        print(f'Warm start cost     : {start.cost}')
+    # lower bound of the cost: SCIP stops once the incumbent is within the gap of it
+    bound = lower_bound(data['size_item'], [copy[1:] for copy in copies])
+    solver.Add(cost >= bound)
+    print(f'Lower bound         : {bound}')
+    within_gap = start is not None and gap(start.cost, bound) <= args.gap
+    if within_gap:
+        # the heuristic packing is already good enough: fix it, SCIP only checks it
+        for var, value in zip(hint_vars, hint_values):
+            var.SetBounds(value, value)
+    params = pywraplp.MPSolverParameters()
+    params.SetDoubleParam(params.RELATIVE_MIP_GAP, args.gap)
     solver.set_time_limit(time_limit * 1000)
 
-    status = solver.Solve()
+    status = solver.Solve(params)
     print(status)
     if status == pywraplp.Solver.OPTIMAL or status == pywraplp.Solver.FEASIBLE:
         mem_after = process.memory_info().rss / 1024 / 1024  # Chuyển sang MB
@@ -147,16 +336,17 @@ if __name__ == '__main__':
         for i in range(n):
             print(f'put item {i+1} with rotation {int(Ro[i].solution_value())}', end=' ') 
             for j in range(k):
-                if x[i,j].solution_value() ==1:
-                    print(f'in bin {j+1}', end=' ')
+                if (i,j) in x and x[i,j].solution_value() ==1:
+                    print(f'in bin {truck_id[j]}', end=' ')
             print(f'at {l[i].solution_value()} {b[i].solution_value()} -> {r[i].solution_value()} {t[i].solution_value()}')
         print(f'Number of bin used  :',int(sum(z[m].solution_value() for m in range(k))))
         print(f'Total cost          : {solver.Objective().Value()}')
+        print(f'Gap                 : {gap(solver.Objective().Value(), bound):.2%}')
         cost = solver.Objective().Value()
         running_time = solver.WallTime() / 1000
         print(cost)
         print('----------------Statistics----------------')
-        if status == pywraplp.Solver.OPTIMAL:
+        if status == pywraplp.Solver.OPTIMAL and not within_gap:
             print('Status              : OPTIMAL')
         else:
             print('Status              : FEASIBLE')
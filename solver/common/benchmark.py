@@ -0,0 +1,139 @@
+'''
+    Benchmark runner shared by the analysis scripts.
+
+    Every job (one instance, possibly with one model) runs in its own process, with
+    up to a given number of jobs at a time. A job is killed once it runs longer than
+    a time cap, and its address space is limited to a memory cap. The row of every
+    job is appended to the CSV file as soon as the job finishes, so a crash loses
+    nothing; on a restart, jobs already in the CSV file are skipped.
+    A job that fails, crashes or is killed gets a row of -1 with its key (delete
+    that row to run the job again).
+'''
+import csv
+import glob
+import multiprocessing
+import os
+import resource
+import time
+
+INPUT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'input_data')
+
+
+def add_benchmark_arguments(parser, output):
+    '''
+        Add the input folder, output CSV file, parallel jobs and caps to an argparse parser.
+    '''
+    parser.add_argument('--input-folder', default=INPUT_FOLDER, help='folder of the .txt instances')
+    parser.add_argument('--output', default=output, help='CSV file results are appended to')
+    parser.add_argument('--jobs', type=int, default=1, help='instances solved at the same time')
+    parser.add_argument('--time-cap', type=float, default=None, help='seconds after which a job is killed')
+    parser.add_argument('--memory-cap', type=int, default=None, help='address space of a job in MB')
+
+
+def input_files(input_folder):
+    '''
+        Return the .txt files of input_folder, smallest first.
+    '''
+    return sorted(glob.glob(os.path.join(input_folder, '*.txt')), key=os.path.getsize)
+
+
+def check_header(output_csv, fieldnames):
+    '''
+        Raise ValueError if output_csv already has rows under other columns than fieldnames
+        (e.g. written by an older version of a script), as results cannot be appended to it.
+    '''
+    if not os.path.exists(output_csv) or os.path.getsize(output_csv) == 0:
+        return
+    with open(output_csv, newline='') as csvfile:
+        header = next(csv.reader(csvfile), [])
+    if header != list(fieldnames):
+        raise ValueError(f'{output_csv} has the columns {header}, expected {list(fieldnames)}; '
+                         f'give another --output or move the file away to start a new one')
+
+
+def finished_keys(output_csv, key_fields):
+    '''
+        Return the keys (values of key_fields, as strings) of the rows already in output_csv.
+    '''
+    if not os.path.exists(output_csv):
+        return set()
+    with open(output_csv, newline='') as csvfile:
+        return {tuple(row[field] for field in key_fields) for row in csv.DictReader(csvfile)}
+
+
+def _run_job(solve, args, memory_cap, connection):
+    if memory_cap is not None:
+        limit = memory_cap * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    try:
+        connection.send(('ok', solve(*args)))
+    except BaseException as error:
+        connection.send(('error', repr(error)))
+    connection.close()
+
+
+def run_benchmark(solve, jobs, output_csv, fieldnames, key_fields=('file_name',), n_jobs=1, time_cap=None,
+                  memory_cap=None):
+    '''
+        Run solve(*args) for every job (key, args) and append the row (dictionary) it
+        returns to output_csv. key holds the values of key_fields of the row, and jobs
+        whose key is already in output_csv are skipped.
+        Return the number of jobs run. Raise ValueError if output_csv has other columns.
+    '''
+    check_header(output_csv, fieldnames)
+    done = finished_keys(output_csv, key_fields)
+    pending = [(key, args) for key, args in jobs if tuple(map(str, key)) not in done]
+    if len(pending) < len(jobs):
+        print(f'Skipping {len(jobs) - len(pending)} jobs already in {output_csv}')
+    new_file = not os.path.exists(output_csv) or os.path.getsize(output_csv) == 0
+
+    with open(output_csv, 'a', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames, restval=-1, extrasaction='ignore')
+        if new_file:
+            writer.writeheader()
+            csvfile.flush()
+
+        n_run = len(pending)
+        running = {}  # process -> (key, connection, start time)
+        while pending or running:
+            while pending and len(running) < n_jobs:
+                key, args = pending.pop(0)
+                receiver, sender = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(target=_run_job, args=(solve, args, memory_cap, sender))
+                process.start()
+                sender.close()
+                running[process] = (key, receiver, time.monotonic())
+
+            for process, (key, receiver, started) in list(running.items()):
+                # Checked before polling: a job that sent its row and exited is not a crash
+                alive = process.is_alive()
+                row, reason = None, None
+                if receiver.poll():
+                    try:
+                        status, value = receiver.recv()
+                    except EOFError:
+                        # The job died without sending its row (segfault, abort, os._exit)
+                        process.join()
+                        status, value = 'error', f'exit code {process.exitcode}'
+                    if status == 'ok':
+                        row = value
+                    else:
+                        reason = value
+                elif not alive:
+                    reason = f'exit code {process.exitcode}'
+                elif time_cap is not None and time.monotonic() - started > time_cap:
+                    process.kill()
+                    reason = f'killed after {time_cap} s'
+                else:
+                    continue
+
+                process.join()
+                receiver.close()
+                del running[process]
+                if row is None:
+                    print(f'Job {key} failed: {reason}')
+                    row = dict(zip(key_fields, key))
+                writer.writerow(row)
+                csvfile.flush()
+            time.sleep(0.05)
+    return n_run
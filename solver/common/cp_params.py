@@ -0,0 +1,121 @@
+'''
+    CP-SAT search options shared by the CP models: number of workers, search
+    portfolio, linearization level and deterministic mode; and a solution callback
+    recording (and optionally streaming) every improving solution.
+'''
+import json
+
+from ortools.sat.python import cp_model
+
+from common.lower_bounds import gap
+
+# Parameter overrides of every search portfolio
+SEARCH_PORTFOLIOS = {
+    # CP-SAT default: full search workers next to LNS workers
+    'default': {},
+    # Only LNS workers improving the incumbent (warm start); optimality is not proven
+    'lns': {'use_lns_only': True},
+    # Only full search workers
+    'no_lns': {'use_lns': False},
+}
+
+
+def add_solver_arguments(parser):
+    '''
+        Add the CP-SAT options to an argparse parser.
+    '''
+    parser.add_argument('--workers', type=int, default=0,
+                        help='CP-SAT search workers (default 0: one per CPU)')
+    parser.add_argument('--search', choices=list(SEARCH_PORTFOLIOS), default='default',
+                        help='search portfolio of the workers')
+    parser.add_argument('--linearization-level', type=int, choices=[0, 1, 2], default=None,
+                        help='linear relaxation used by the workers (CP-SAT default 1)')
+    parser.add_argument('--deterministic', action='store_true',
+                        help='interleaved search, time limit in deterministic time')
+    parser.add_argument('--gap', type=float, default=0,
+                        help='stop once the cost is within this relative gap of the lower bound')
+
+
+def solver_options(args):
+    '''
+        Return the CP-SAT options parsed by add_solver_arguments, as keyword arguments
+        of configure_solver.
+    '''
+    return {
+        'workers': args.workers,
+        'search': args.search,
+        'linearization_level': args.linearization_level,
+        'deterministic': args.deterministic,
+        'gap_limit': args.gap,
+    }
+
+
+def configure_solver(solver, time_limit, workers=0, search='default', linearization_level=None,
+                     deterministic=False, gap_limit=0):
+    '''
+        Set the time limit and search options of a CpSolver.
+        In deterministic mode the workers run interleaved and the limit is deterministic
+        time, so the same instance and options always give the same result.
+        Ctrl-C stops the search like the time limit: Solve returns the best solution so far.
+        The search also stops once the relative gap to the solver bound is at most gap_limit.
+    '''
+    parameters = solver.parameters
+    parameters.catch_sigint_signal = True
+    parameters.num_workers = workers
+    for name, value in SEARCH_PORTFOLIOS[search].items():
+        setattr(parameters, name, value)
+    if linearization_level is not None:
+        parameters.linearization_level = linearization_level
+    parameters.relative_gap_limit = gap_limit
+    if deterministic:
+        parameters.interleave_search = True
+        parameters.max_deterministic_time = time_limit
+    else:
+        parameters.max_time_in_seconds = time_limit
+    return solver
+
+
+class ObjectiveTrace(cp_model.CpSolverSolutionCallback):
+    '''
+        Record the wall time, cost and bound of every improving solution.
+        If a stream is given, every solution is also written to it as a JSON line with
+        its cost, wall time, bound and gap, and the placements returned by decode(self)
+        if decode is given.
+        The bound is the better of the solver bound and lower_bound (common.lower_bounds);
+        the search is stopped once the gap to it is at most gap_limit.
+    '''
+
+    def __init__(self, stream=None, decode=None, lower_bound=0, gap_limit=0):
+        super().__init__()
+        self.stream = stream
+        self.decode = decode
+        self.lower_bound = lower_bound
+        self.gap_limit = gap_limit
+        self.solutions = []  # (wall time in seconds, objective value, objective bound)
+
+    def on_solution_callback(self):
+        wall_time, cost = self.WallTime(), self.ObjectiveValue()
+        bound = max(self.BestObjectiveBound(), self.lower_bound)
+        self.solutions.append((wall_time, cost, bound))
+        if self.stream is not None:
+            line = {'cost': cost, 'time': round(wall_time, 3), 'bound': bound, 'gap': gap(cost, bound)}
+            if self.decode is not None:
+                line['placements'] = self.decode(self)
+            self.stream.write(json.dumps(line) + '\n')
+            self.stream.flush()
+        if gap(cost, bound) <= self.gap_limit:
+            self.StopSearch()
+
+    @property
+    def curve(self):
+        '''Cost over time: [(wall time, cost), ...] of the improving solutions.'''
+        return [(wall_time, cost) for wall_time, cost, _ in self.solutions]
+
+    @property
+    def time_to_best(self):
+        '''Wall time at which the best cost was first reached, None if no solution.'''
+        if not self.solutions:
+            return None
+        best = min(cost for _, cost, _ in self.solutions)
+        return next(wall_time for wall_time, cost, _ in self.solutions if cost == best)
+
@@ -0,0 +1,108 @@
+'''
+    Can a set of items be packed into one truck? Memoized.
+
+    The result only depends on the multiset of item sides (rotation allowed, so an
+    item is its sorted sides) and the truck sides, so it is cached under that key
+    and reused for any items and truck of the same dimensions: across iterations of
+    a decomposition and across instances. The cache can be saved to a JSON file.
+'''
+import json
+
+from ortools.sat.python import cp_model
+
+from common.presolve import fits
+from common.warm_start import heuristic_start
+
+
+def pack_one_truck(items, W, H, time_limit=10):
+    '''
+        Return [(x, y, rotated)] of items (w, h) packed into one W x H truck, False if
+        they cannot be, or None if neither was found within time_limit seconds.
+        The heuristic is tried first; CP-SAT with NoOverlap2D decides the rest.
+    '''
+    if sum(w * h for w, h in items) > W * H or any(not fits(item, (W, H)) for item in items):
+        return False
+    start = heuristic_start(items, [(W, H, 1)])
+    if start is not None:
+        return [(x, y, rotated) for _, x, y, rotated in start.placements]
+
+    model = cp_model.CpModel()
+    x_intervals, y_intervals, variables = [], [], []
+    for w, h in items:
+        rotated = model.NewBoolVar('')
+        if w == h or h > W or w > H:
+            model.Add(rotated == 0)
+        if w > W or h > H:
+            model.Add(rotated == 1)
+        width = model.NewIntVar(min(w, h), max(w, h), '')
+        height = model.NewIntVar(min(w, h), max(w, h), '')
+        model.Add(width == w + (h - w) * rotated)
+        model.Add(height == h + (w - h) * rotated)
+        left, right = model.NewIntVar(0, W, ''), model.NewIntVar(0, W, '')
+        bottom, top = model.NewIntVar(0, H, ''), model.NewIntVar(0, H, '')
+        x_intervals.append(model.NewIntervalVar(left, width, right, ''))
+        y_intervals.append(model.NewIntervalVar(bottom, height, top, ''))
+        variables.append((left, bottom, rotated))
+    model.AddNoOverlap2D(x_intervals, y_intervals)
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    status = solver.Solve(model)
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        return [tuple(solver.Value(var) for var in item) for item in variables]
+    if status == cp_model.INFEASIBLE:
+        return False
+    return None
+
+
+class FeasibilityCache:
+    '''
+        Memoized pack_one_truck. results[key] is the packing of the key's items
+        (in key order) or False; unknown results are not cached.
+    '''
+
+    def __init__(self, time_limit=10):
+        self.time_limit = time_limit
+        self.results = {}
+        self.hits = 0
+        self.misses = 0
+        self.unknown = 0
+
+    def pack(self, items, truck):
+        '''
+            Return [(x, y, rotated)] of items (w, h) packed into truck (W, H, ...), with
+            rotated relative to the given sides, False if they cannot be packed, or
+            None if unknown.
+        '''
+        W, H = truck[:2]
+        order = sorted(range(len(items)), key=lambda i: sorted(items[i]))
+        key = (W, H, tuple(tuple(sorted(items[i])) for i in order))
+        if key in self.results:
+            self.hits += 1
+            result = self.results[key]
+        else:
+            self.misses += 1
+            result = pack_one_truck(list(key[2]), W, H, self.time_limit)
+            if result is None:
+                self.unknown += 1
+                return None
+            self.results[key] = result
+        if result is False:
+            return False
+
+        # Cached items are (short side, long side); turn the rotation back to the given sides
+        placements = [None] * len(items)
+        for i, (x, y, rotated) in zip(order, result):
+            w, h = items[i]
+            placements[i] = (x, y, rotated if w <= h else 1 - rotated)
+        return placements
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump([[W, H, items, result] for (W, H, items), result in self.results.items()], f)
+
+    def load(self, path):
+        with open(path) as f:
+            for W, H, items, result in json.load(f):
+                key = (W, H, tuple(tuple(item) for item in items))
+                self.results[key] = result if result is False else [tuple(place) for place in result]
@@ -0,0 +1,158 @@
+'''
+    Reproducible instance generator for scaling benchmarks.
+
+    Instances of any size are streamed to disk in chunks, in the text format and/or
+    in the binary format of common.loader (one flat int32 .npy array laid out like
+    the text file, memory-mapped when loaded). The same seed and options always give
+    the same instance, in either format.
+
+    Defaults match the files of input_data: item sides uniform in [1, 10], truck
+    sides uniform in [10, 20] and truck costs uniform in [50, 100], as many trucks
+    as items.
+
+        python generator.py input_data/1000000 --items 1000000 --seed 1 --format both
+'''
+import argparse
+import itertools
+import os
+
+import numpy as np
+
+# Rows generated at a time; part of the random stream, so changing it changes instances
+CHUNK = 1 << 20
+
+# Beta(a, b) shapes of the item side distributions ('mixed': half small, half large)
+ITEM_DISTRIBUTIONS = {
+    'uniform': (1, 1),
+    'small': (1, 3),
+    'large': (3, 1),
+    'mixed': None,
+}
+
+
+def _rng(seed, *stream):
+    '''Independent generator of one stream (items, truck types, trucks chunk, ...).'''
+    return np.random.default_rng([seed, *stream])
+
+
+def _sides(rng, count, low, high, distribution):
+    if distribution == 'uniform':
+        return rng.integers(low, high + 1, size=count)
+    if distribution == 'mixed':
+        a = np.where(rng.random(count) < 0.5, 1, 3)
+        fraction = rng.beta(a, 4 - a)
+    else:
+        fraction = rng.beta(*ITEM_DISTRIBUTIONS[distribution], size=count)
+    return np.minimum(low + (fraction * (high - low + 1)).astype(np.int64), high)
+
+
+def _costs(rng, W, H, truck_size, cost_range, structure):
+    '''
+        Truck costs in cost_range: 'uniform' ignores the size, 'area' grows linearly with
+        the area (5% noise), 'economy' grows with its square root (big trucks are
+        cheaper per unit of area).
+    '''
+    low, high = cost_range
+    if structure == 'uniform':
+        return rng.integers(low, high + 1, size=len(W))
+    min_area, max_area = truck_size[0] ** 2, truck_size[1] ** 2
+    fraction = (W * H - min_area) / max(1, max_area - min_area)
+    if structure == 'economy':
+        fraction = np.sqrt(fraction)
+    cost = (low + fraction * (high - low)) * rng.uniform(0.95, 1.05, size=len(W))
+    return np.clip(np.rint(cost), low, high).astype(np.int64)
+
+
+def items(n, seed=0, distribution='uniform', item_size=(1, 10)):
+    '''
+        Yield the items of an instance as (m, 2) arrays of (w, h), chunk by chunk.
+    '''
+    for index, start in enumerate(range(0, n, CHUNK)):
+        rng = _rng(seed, 0, index)
+        count = min(CHUNK, n - start)
+        yield np.column_stack([_sides(rng, count, *item_size, distribution),
+                               _sides(rng, count, *item_size, distribution)])
+
+
+def trucks(k, seed=0, truck_size=(10, 20), cost_range=(50, 100), cost='uniform', truck_types=None):
+    '''
+        Yield the trucks of an instance as (m, 3) arrays of (W, H, C), chunk by chunk.
+        With truck_types, every truck is one of that many types drawn first, so
+        there are many identical trucks.
+    '''
+    def draw(rng, count):
+        W = rng.integers(truck_size[0], truck_size[1] + 1, size=count)
+        H = rng.integers(truck_size[0], truck_size[1] + 1, size=count)
+        return np.column_stack([W, H, _costs(rng, W, H, truck_size, cost_range, cost)])
+
+    types = draw(_rng(seed, 1), truck_types) if truck_types else None
+    for index, start in enumerate(range(0, k, CHUNK)):
+        rng = _rng(seed, 2, index)
+        count = min(CHUNK, k - start)
+        yield types[rng.integers(0, truck_types, size=count)] if types is not None else draw(rng, count)
+
+
+def write(path, n, k=None, seed=0, item_distribution='uniform', item_size=(1, 10), truck_size=(10, 20),
+          cost_range=(50, 100), cost='uniform', truck_types=None, formats=('text',)):
+    '''
+        Generate an instance of n items and k trucks (n by default) and write it to
+        path + '.txt' (text) and/or path + '.npy' (binary). Return the paths written.
+    '''
+    k = n if k is None else k
+    if item_size[1] > truck_size[1]:
+        raise ValueError('items larger than every truck')
+    chunks = itertools.chain([np.array([[n, k]])], items(n, seed, item_distribution, item_size),
+                             trucks(k, seed, truck_size, cost_range, cost, truck_types))
+
+    text = open(path + '.txt', 'w') if 'text' in formats else None
+    binary = None
+    if 'binary' in formats:
+        binary = np.lib.format.open_memmap(path + '.npy', mode='w+', dtype=np.int32, shape=(2 + 2 * n + 3 * k,))
+    offset = 0
+    try:
+        for chunk in chunks:
+            if text is not None:
+                # One format string per chunk: much faster than np.savetxt, which formats row by row
+                text.write((' '.join(['%d'] * chunk.shape[1]) + '\n') * len(chunk) % tuple(chunk.ravel().tolist()))
+            if binary is not None:
+                binary[offset:offset + chunk.size] = chunk.ravel()
+            offset += chunk.size
+    finally:
+        if text is not None:
+            text.close()
+        if binary is not None:
+            # Flushed after the text file, so the loader takes it as an up-to-date sidecar
+            binary.flush()
+            del binary
+            os.utime(path + '.npy')
+
+    return [path + extension for extension, name in (('.txt', 'text'), ('.npy', 'binary')) if name in formats]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a reproducible truck packing instance.')
+    parser.add_argument('path', help='output path without extension (.txt and/or .npy are added)')
+    parser.add_argument('--items', type=int, required=True)
+    parser.add_argument('--trucks', type=int, default=None, help='number of trucks (default: as many as items)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--item-distribution', choices=list(ITEM_DISTRIBUTIONS), default='uniform')
+    parser.add_argument('--item-size', type=int, nargs=2, default=[1, 10], metavar=('MIN', 'MAX'))
+    parser.add_argument('--truck-size', type=int, nargs=2, default=[10, 20], metavar=('MIN', 'MAX'))
+    parser.add_argument('--truck-types', type=int, default=None,
+                        help='draw only this many distinct trucks and repeat them')
+    parser.add_argument('--cost', choices=['uniform', 'area', 'economy'], default='uniform',
+                        help='uniform: independent of the size; area: linear in the area; '
+                             'economy: square root of the area')
+    parser.add_argument('--cost-range', type=int, nargs=2, default=[50, 100], metavar=('MIN', 'MAX'))
+    parser.add_argument('--format', choices=['text', 'binary', 'both'], default='text')
+    args = parser.parse_args()
+
+    formats = ('text', 'binary') if args.format == 'both' else (args.format,)
+    paths = write(args.path, args.items, args.trucks, args.seed, args.item_distribution, tuple(args.item_size),
+                  tuple(args.truck_size), tuple(args.cost_range), args.cost, args.truck_types, formats)
+    for path in paths:
+        print(f'{path}: {os.path.getsize(path) / 1024 / 1024:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
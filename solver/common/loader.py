@@ -0,0 +1,132 @@
+'''
+    Instance loader shared by the solvers.
+
+    An instance is read once into read-only int32 NumPy arrays: item widths and
+    heights, truck widths, heights and costs. The text format is
+        n k
+        w h          (n lines)
+        W H C        (k lines)
+    Next to a text file, the same numbers can be kept in a binary sidecar (.npy,
+    one flat int32 array laid out like the text file). The sidecar is memory-mapped,
+    so even a million-item instance opens without parsing text and only the pages
+    used are read.
+'''
+import os
+import sys
+from dataclasses import dataclass
+
+import numpy as np
+
+INT32_MAX = np.iinfo(np.int32).max
+
+
+@dataclass(frozen=True)
+class Instance:
+    '''Items (w, h) and trucks (W, H, C) of one problem, as read-only int32 arrays.'''
+    item_w: np.ndarray
+    item_h: np.ndarray
+    truck_w: np.ndarray
+    truck_h: np.ndarray
+    truck_cost: np.ndarray
+
+    @property
+    def n_items(self):
+        return len(self.item_w)
+
+    @property
+    def n_trucks(self):
+        return len(self.truck_w)
+
+    def items(self):
+        '''Items as a list of (w, h) tuples of Python ints.'''
+        return list(zip(self.item_w.tolist(), self.item_h.tolist()))
+
+    def trucks(self):
+        '''Trucks as a list of (W, H, C) tuples of Python ints.'''
+        return list(zip(self.truck_w.tolist(), self.truck_h.tolist(), self.truck_cost.tolist()))
+
+    def to_data(self):
+        '''
+            Return n, k, data ({'size_item', 'size_truck', 'cost'} lists) and the truck
+            widths and heights, as the CP and MIP models take them.
+        '''
+        data = {
+            'size_item': [[w, h] for w, h in zip(self.item_w.tolist(), self.item_h.tolist())],
+            'size_truck': [[W, H] for W, H in zip(self.truck_w.tolist(), self.truck_h.tolist())],
+            'cost': self.truck_cost.tolist(),
+        }
+        return self.n_items, self.n_trucks, data, self.truck_w.tolist(), self.truck_h.tolist()
+
+
+def from_values(values):
+    '''
+        Return the Instance of the flat numbers of the text format (any integer array),
+        sharing memory with values if it is already a read-only int32 array.
+    '''
+    values = np.asarray(values)
+    if len(values) < 2:
+        raise ValueError('missing the number of items and trucks')
+    n, k = int(values[0]), int(values[1])
+    if len(values) < 2 + 2 * n + 3 * k:
+        raise ValueError(f'expected {n} items and {k} trucks, got {len(values) - 2} numbers')
+    if values.dtype != np.int32:
+        if values.size and (values.min() < 0 or values.max() > INT32_MAX):
+            raise ValueError('sizes and costs must be non-negative int32 values')
+        values = values.astype(np.int32)
+    values.flags.writeable = False
+
+    items = values[2:2 + 2 * n].reshape(n, 2)
+    trucks = values[2 + 2 * n:2 + 2 * n + 3 * k].reshape(k, 3)
+    return Instance(items[:, 0], items[:, 1], trucks[:, 0], trucks[:, 1], trucks[:, 2])
+
+
+def read(stream=None):
+    '''
+        Return the Instance read in the text format from a binary or text stream
+        (standard input by default).
+    '''
+    stream = stream if stream is not None else sys.stdin.buffer
+    return from_values(np.array(stream.read().split(), dtype=np.int64))
+
+
+def sidecar_path(file_path):
+    return os.path.splitext(file_path)[0] + '.npy'
+
+
+def save_sidecar(instance, path):
+    '''
+        Write an Instance as one flat int32 array in the layout of the text format.
+    '''
+    values = np.concatenate([
+        np.array([instance.n_items, instance.n_trucks], dtype=np.int32),
+        np.column_stack([instance.item_w, instance.item_h]).ravel(),
+        np.column_stack([instance.truck_w, instance.truck_h, instance.truck_cost]).ravel(),
+    ]).astype(np.int32)
+    np.save(path, values)
+
+
+def load(file_path, sidecar=True, write_sidecar=False):
+    '''
+        Return the Instance of a file. A .npy file is memory-mapped; for a text file,
+        its sidecar is memory-mapped instead if sidecar and it is not older than the
+        text file. With write_sidecar, a sidecar is written after parsing the text.
+    '''
+    if file_path.endswith('.npy'):
+        return from_values(np.load(file_path, mmap_mode='r'))
+
+    binary = sidecar_path(file_path)
+    if sidecar and os.path.exists(binary) and os.path.getmtime(binary) >= os.path.getmtime(file_path):
+        return from_values(np.load(binary, mmap_mode='r'))
+
+    # Whitespace-separated integers, parsed in C
+    instance = from_values(np.fromfile(file_path, dtype=np.int64, sep=' '))
+    if write_sidecar:
+        save_sidecar(instance, binary)
+    return instance
+
+
+if __name__ == '__main__':
+    # Write the sidecar of every file given: python loader.py input_data/*.txt
+    for file_path in sys.argv[1:]:
+        instance = load(file_path, sidecar=False, write_sidecar=True)
+        print(f'{sidecar_path(file_path)}: {instance.n_items} items, {instance.n_trucks} trucks')
@@ -0,0 +1,112 @@
+'''
+    Lower bounds on the cost of packing items (w, h) into trucks (W, H, C), cheap
+    enough to compute before solving.
+
+    - Continuous bound: the trucks bought must hold the total item area; buying
+      fractions of trucks, the cheapest cost per unit of area comes first.
+    - Large-item bound (after Martello and Vigo's L2): items of which no two fit
+      one truck together each need a truck of their own, among the trucks they fit.
+      Together with the area of the items that fit only some trucks, which must be
+      held by those trucks, this is a small LP over the truck types.
+    Costs are integers, so bounds are rounded up.
+'''
+import math
+
+from ortools.linear_solver import pywraplp
+
+from common.presolve import can_share, fits
+from common.truck_types import group_trucks
+
+EPS = 1e-6
+
+
+def area_bound(items, trucks):
+    '''
+        Return the cost of the cheapest fractional set of trucks whose area is at least
+        the total item area (at most the number of items of every type is bought).
+    '''
+    area = sum(w * h for w, h in items)
+    bound = 0
+    for truck_type in sorted(group_trucks(trucks), key=lambda t: t.cost / (t.width * t.height)):
+        if area <= 0:
+            break
+        truck_area = truck_type.width * truck_type.height
+        bought = min(min(truck_type.count, len(items)), area / truck_area)
+        bound += bought * truck_type.cost
+        area -= bought * truck_area
+    return math.ceil(bound - EPS)
+
+
+def large_items(items, trucks, limit=None):
+    '''
+        Return the indices of items of which no two can be in one truck together,
+        picked greedily by decreasing area among the first limit items.
+    '''
+    types = [(t.width, t.height) for t in group_trucks(trucks)]
+    order = sorted(range(len(items)), key=lambda i: -items[i][0] * items[i][1])[:limit]
+    chosen = []
+    for i in order:
+        if all(not can_share(items[i], items[j], truck) for j in chosen for truck in types if
+               fits(items[i], truck) and fits(items[j], truck)):
+            chosen.append(i)
+    return chosen
+
+
+def large_item_bound(items, trucks, limit=200):
+    '''
+        Return the LP bound over truck types y_t in [0, min(count, n)]: the trucks an item
+        fits hold the area of all items fitting only those trucks, and one truck per
+        large item among the trucks it fits (every set of large items needs as many
+        trucks fitting one of them).
+    '''
+    types = group_trucks(trucks)
+    large = large_items(items, trucks, limit)
+
+    solver = pywraplp.Solver.CreateSolver('GLOP')
+    y = [solver.NumVar(0, min(t.count, len(items)), f'y[{j}]') for j, t in enumerate(types)]
+
+    # area[F] = area of the items that fit exactly the truck types in F
+    # (one object per distinct F, so lookups compare by identity)
+    area = {}
+    fitting_of_size = {}
+    for w, h in items:
+        if (w, h) not in fitting_of_size:
+            fitting = frozenset(j for j, t in enumerate(types) if fits((w, h), (t.width, t.height)))
+            area.setdefault(fitting, 0)
+            fitting_of_size[(w, h)] = next(other for other in area if other == fitting)
+        area[fitting_of_size[(w, h)]] += w * h
+    area[frozenset(range(len(types)))] = area.get(frozenset(range(len(types))), 0)
+    for fitting in area:
+        row = solver.Constraint(sum(item_area for other, item_area in area.items() if other <= fitting), solver.infinity())
+        for j in fitting:
+            row.SetCoefficient(y[j], types[j].width * types[j].height)
+
+    # Large items sorted by the trucks they fit: the first q of them need q trucks
+    # fitting at least one of them
+    fitting = sorted((fitting_of_size[tuple(items[i])] for i in large), key=len)
+    union = set()
+    for q, trucks_of_item in enumerate(fitting, start=1):
+        union |= trucks_of_item
+        row = solver.Constraint(q, solver.infinity())
+        for j in union:
+            row.SetCoefficient(y[j], 1)
+
+    objective = solver.Objective()
+    for j, t in enumerate(types):
+        objective.SetCoefficient(y[j], t.cost)
+    objective.SetMinimization()
+    if solver.Solve() != pywraplp.Solver.OPTIMAL:
+        return math.inf
+    return math.ceil(solver.Objective().Value() - EPS)
+
+
+def lower_bound(items, trucks):
+    '''
+        Return the best of the lower bounds.
+    '''
+    return max(area_bound(items, trucks), large_item_bound(items, trucks))
+
+
+def gap(cost, bound):
+    '''Relative gap between a cost and a lower bound of the optimum.'''
+    return abs(cost - bound) / max(1, abs(cost))
@@ -0,0 +1,120 @@
+'''
+    Cache of built models on disk, keyed by a hash of the instance content and the
+    formulation, so repeated runs and parameter sweeps load a model instead of
+    building it again in Python.
+
+    - CP-SAT models are saved in the text proto format (CpModel.ExportToFile) and
+      parsed back; the Python binding cannot read the binary format back.
+    - MIP models (pywraplp) are saved as a binary MPModelProto and loaded with
+      LoadModelFromProto.
+    Next to every model a JSON file keeps the proto index of the variables the
+    caller reads (dictionaries of variables, or of tuples of variables), and any
+    statistics of the build the caller wants back.
+'''
+import hashlib
+import json
+import os
+
+from ortools.linear_solver import linear_solver_pb2
+from ortools.linear_solver import pywraplp
+from ortools.sat.python import cp_model
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '.model_cache')
+
+# Part of every key: increase it when a formulation changes, so older models are not loaded
+VERSION = 1
+
+
+def instance_hash(formulation, items, trucks, *options):
+    '''
+        Return the cache key of a formulation built for items (w, h), trucks (W, H, C)
+        and any other options the model depends on.
+    '''
+    content = json.dumps([VERSION, formulation, [list(item) for item in items],
+                          [list(truck) for truck in trucks], list(options)])
+    return hashlib.sha256(content.encode()).hexdigest()[:24]
+
+
+def _save_meta(path, variables, index, stats):
+    encoded = {}
+    for name, by_key in variables.items():
+        encoded[name] = []
+        for key, value in by_key.items():
+            key = list(key) if isinstance(key, tuple) else [key]
+            value = [index(var) for var in value] if isinstance(value, tuple) else index(value)
+            encoded[name].append([key, value])
+    with open(path, 'w') as f:
+        json.dump({'variables': encoded, 'stats': stats}, f)
+
+
+def _load_meta(path, variable):
+    with open(path) as f:
+        meta = json.load(f)
+    variables = {}
+    for name, entries in meta['variables'].items():
+        variables[name] = {}
+        for key, value in entries:
+            key = tuple(key) if len(key) > 1 else key[0]
+            variables[name][key] = tuple(map(variable, value)) if isinstance(value, list) else variable(value)
+    return variables, meta['stats']
+
+
+def _paths(cache_dir, key, extension):
+    return os.path.join(cache_dir, key + extension), os.path.join(cache_dir, key + '.json')
+
+
+def save_cp_model(cache_dir, key, model, variables, stats=None):
+    '''
+        Save a CpModel with variables {name: {key: variable}} and stats (JSON values).
+    '''
+    os.makedirs(cache_dir, exist_ok=True)
+    model_path, meta_path = _paths(cache_dir, key, '.pbtxt')
+    model.ExportToFile(model_path)
+    _save_meta(meta_path, variables, lambda var: var.Index(), stats)
+
+
+def load_cp_model(cache_dir, key):
+    '''
+        Return the CpModel, variables and stats saved under key, or None if there are none.
+    '''
+    model_path, meta_path = _paths(cache_dir, key, '.pbtxt')
+    if not os.path.exists(model_path) or not os.path.exists(meta_path):
+        return None
+    model = cp_model.CpModel()
+    with open(model_path) as f:
+        model.Proto().parse_text_format(f.read())
+    variables, stats = _load_meta(meta_path, model.GetIntVarFromProtoIndex)
+    return model, variables, stats
+
+
+def save_mip_model(cache_dir, key, solver, variables, stats=None):
+    '''
+        Save the model of a pywraplp solver with variables {name: {key: variable or tuple}}.
+    '''
+    os.makedirs(cache_dir, exist_ok=True)
+    model_path, meta_path = _paths(cache_dir, key, '.pb')
+    proto = linear_solver_pb2.MPModelProto()
+    solver.ExportModelToProto(proto)
+    with open(model_path, 'wb') as f:
+        f.write(proto.SerializeToString())
+    _save_meta(meta_path, variables, lambda var: var.index(), stats)
+
+
+def load_mip_model(cache_dir, key, solver_name='SCIP'):
+    '''
+        Return a new pywraplp solver holding the model saved under key, its variables
+        and stats, or None if there are none.
+    '''
+    model_path, meta_path = _paths(cache_dir, key, '.pb')
+    if not os.path.exists(model_path) or not os.path.exists(meta_path):
+        return None
+    proto = linear_solver_pb2.MPModelProto()
+    with open(model_path, 'rb') as f:
+        proto.ParseFromString(f.read())
+    solver = pywraplp.Solver.CreateSolver(solver_name)
+    error = solver.LoadModelFromProto(proto)
+    if error:
+        raise ValueError(f'cannot load cached model {model_path}: {error}')
+    all_variables = solver.variables()
+    variables, stats = _load_meta(meta_path, lambda index: all_variables[index])
+    return solver, variables, stats
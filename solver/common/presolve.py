@@ -0,0 +1,92 @@
+'''
+    Instance-aware reductions for the exact models, applied before the model is built.
+
+    - All sides are divided by their greatest common divisor (coordinates of any
+      packing can be shifted to multiples of it), so domains are smaller.
+    - Item i gets variables for truck m only if it fits m in some orientation.
+    - Two items that fit a truck but can never be in it together (side by side
+      does not fit in any orientation) only need "not both" instead of the
+      non-overlap constraints.
+    - Coordinates are bounded by the trucks the item fits, minus its shorter side.
+'''
+from functools import reduce
+from math import gcd
+
+
+def common_scale(items, trucks):
+    '''
+        Return the greatest common divisor of every item and truck side.
+    '''
+    sides = [side for item in items for side in item[:2]] + [side for truck in trucks for side in truck[:2]]
+    return reduce(gcd, sides, 0) or 1
+
+
+def fits(item, truck):
+    w, h = item[:2]
+    W, H = truck[:2]
+    return (w <= W and h <= H) or (h <= W and w <= H)
+
+
+def can_share(item_a, item_b, truck):
+    '''
+        Return True if both items fit the truck together, side by side or one above
+        the other, in some orientation of each.
+    '''
+    W, H = truck[:2]
+    for wa, ha in (item_a[:2], item_a[1::-1]):
+        for wb, hb in (item_b[:2], item_b[1::-1]):
+            if wa + wb <= W and max(ha, hb) <= H:
+                return True
+            if ha + hb <= H and max(wa, wb) <= W:
+                return True
+    return False
+
+
+class Reduction:
+    '''
+        Which item-truck variables and item pairs a model needs, and what was removed.
+        Models add to removed_variables and removed_constraints as they skip them.
+    '''
+
+    def __init__(self, items, trucks):
+        self.n = len(items)
+        self.k = len(trucks)
+        # fit[i] = trucks item i fits, in increasing order
+        self.fit = [[m for m, truck in enumerate(trucks) if fits(item, truck)] for item in items]
+        self.fit_sets = [set(trucks_of_item) for trucks_of_item in self.fit]
+
+        # Largest left and bottom coordinate over the trucks the item fits
+        self.max_left = []
+        self.max_bottom = []
+        for item, trucks_of_item in zip(items, self.fit):
+            short_side = min(item[:2])
+            self.max_left.append(max((trucks[m][0] - short_side for m in trucks_of_item), default=0))
+            self.max_bottom.append(max((trucks[m][1] - short_side for m in trucks_of_item), default=0))
+
+        # exclusive[(i, j)] = trucks both items fit but cannot share, for i < j (if any)
+        self.exclusive = {}
+        self.removed_pairs = 0  # (i, j, m) where i or j does not fit m
+        for i in range(self.n - 1):
+            for j in range(i + 1, self.n):
+                common = self.fit_sets[i] & self.fit_sets[j]
+                self.removed_pairs += self.k - len(common)
+                exclusive = {m for m in common if not can_share(items[i], items[j], trucks[m])}
+                if exclusive:
+                    self.exclusive[(i, j)] = exclusive
+
+        self.removed_item_trucks = self.n * self.k - sum(len(trucks_of_item) for trucks_of_item in self.fit)
+        self.exclusive_pairs = sum(len(trucks_of_pair) for trucks_of_pair in self.exclusive.values())
+        self.removed_variables = 0
+        self.removed_constraints = 0
+
+    def fits(self, i, m):
+        return m in self.fit_sets[i]
+
+    def shared(self, i, j):
+        '''
+            Return the trucks items i < j may share, each with True if they can be in it
+            together (need non-overlap) or False if at most one of them can be in it.
+        '''
+        exclusive = self.exclusive.get((i, j), ())
+        fit_j = self.fit_sets[j]
+        return [(m, m not in exclusive) for m in self.fit[i] if m in fit_j]
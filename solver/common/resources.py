@@ -0,0 +1,94 @@
+'''
+    Per-phase resource accounting for the analysis scripts: wall time, CPU time (all
+    threads of the process, so CP-SAT workers count) and peak RSS of every phase of
+    a run (parse, build, solve, ...).
+
+    The peak RSS of a phase is the high-water mark of the process during that phase
+    alone: Linux lets a process reset its high-water mark (/proc/self/clear_refs),
+    which is then read from /proc/self/status. This counts memory allocated by the
+    solvers in C++, which tracemalloc does not see. Elsewhere, the peak falls back to
+    resource.getrusage, the peak of the whole process so far.
+'''
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+METRICS = ['wall', 'cpu', 'peak_rss']
+
+
+def _reset_peak():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _status_mb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss():
+    '''Peak RSS in MB since the last reset (or since the process started).'''
+    peak = _status_mb('VmHWM')
+    if peak is None:
+        # ru_maxrss is in kB on Linux and in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return peak
+
+
+def current_rss():
+    '''Current RSS in MB (0 if unknown).'''
+    return _status_mb('VmRSS') or 0
+
+
+def phase_columns(phases):
+    '''CSV columns of the phases: <phase>_wall, <phase>_cpu, <phase>_peak_rss.'''
+    return [f'{phase}_{metric}' for phase in phases for metric in METRICS]
+
+
+class ResourceLog:
+    '''
+        Wall time (s), CPU time (s) and peak RSS (MB) of every phase of a run:
+
+            log = ResourceLog()
+            with log.phase('parse'):
+                ...
+            row.update(log.row())
+    '''
+
+    def __init__(self):
+        self.start_rss = current_rss()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        _reset_peak()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.phases[name] = {'wall': time.perf_counter() - wall, 'cpu': time.process_time() - cpu,
+                                 'peak_rss': peak_rss()}
+
+    @property
+    def peak_rss(self):
+        '''Peak RSS over all phases, in MB.'''
+        return max((phase['peak_rss'] for phase in self.phases.values()), default=self.start_rss)
+
+    @property
+    def mem_cost(self):
+        '''Memory of the run: peak RSS over all phases above the RSS at the start, in MB.'''
+        return max(0, self.peak_rss - self.start_rss)
+
+    def row(self):
+        '''The phase columns of a CSV row.'''
+        return {f'{name}_{metric}': value for name, phase in self.phases.items() for metric, value in phase.items()}
@@ -0,0 +1,77 @@
+'''
+    Symmetry breaking for the CP models.
+
+    Identical trucks (same W, H and cost) can swap their contents, and identical
+    items (same sides, rotation allowed) can swap their places, without changing
+    the cost. Only one packing of every such class of packings is kept:
+    - the trucks of a class are used in order: truck m' is used only if the truck
+      m before it in the class is used;
+    - the items of a class are put in non-decreasing truck indices.
+    Both orders can be reached together from any packing: first permute the trucks
+    of every class so the used ones come first, then permute the identical items.
+'''
+
+
+def equivalence_classes(keys):
+    '''
+        Return the indices of equal keys, one list per key with at least two
+        indices, in order of first appearance.
+    '''
+    classes = {}
+    for index, key in enumerate(keys):
+        classes.setdefault(key, []).append(index)
+    return [indices for indices in classes.values() if len(indices) > 1]
+
+
+def truck_classes(trucks):
+    return equivalence_classes(tuple(truck) for truck in trucks)
+
+
+def item_classes(items):
+    # A w x h item and an h x w item are the same item once rotation is allowed
+    return equivalence_classes(tuple(sorted(item)) for item in items)
+
+
+def add_symmetry_breaking(model, x, z, items, trucks):
+    '''
+        Add the ordering constraints to a CP-SAT model where x[(i, m)] = 1 iff item i
+        is in truck m and z[m] = 1 iff truck m is used (keys of x may be missing
+        for trucks an item cannot fit). Return the number of constraints added.
+    '''
+    added = 0
+    for indices in truck_classes(trucks):
+        for m, next_m in zip(indices, indices[1:]):
+            model.Add(z[m] >= z[next_m])
+            added += 1
+
+    for indices in item_classes(items):
+        truck_of = [sum(m * x[(i, m)] for m in range(len(trucks)) if (i, m) in x) for i in indices]
+        for truck, next_truck in zip(truck_of, truck_of[1:]):
+            model.Add(truck <= next_truck)
+            added += 1
+    return added
+
+
+def canonical_start(start, items, trucks):
+    '''
+        Return a copy of a WarmStart that satisfies the ordering constraints: used
+        trucks of a class are moved to the front and identical items swap places
+        so their trucks are in order. The cost does not change.
+    '''
+    # Relabel the trucks of every class, used ones first
+    relabel = list(range(len(trucks)))
+    used = start.used_trucks
+    for indices in truck_classes(trucks):
+        order = [m for m in indices if m in used] + [m for m in indices if m not in used]
+        for m, new_m in zip(order, indices):
+            relabel[m] = new_m
+    placements = [(relabel[m], x, y, rotated) for m, x, y, rotated in start.placements]
+
+    # Hand the places of every item class out in truck order
+    for indices in item_classes(items):
+        places = sorted((placements[i], i) for i in indices)
+        for i, ((m, x, y, rotated), source) in zip(indices, places):
+            width, height = items[source] if not rotated else items[source][::-1]
+            placements[i] = (m, x, y, int(tuple(items[i]) != (width, height)))
+
+    return type(start)(start.cost, placements)
@@ -0,0 +1,39 @@
+'''
+    Group identical trucks (same width, height and cost) into types with counts.
+
+    A packing never uses more trucks of one type than there are items, so the
+    models only need min(count, n) copies of every type instead of all K trucks.
+'''
+
+
+class TruckType:
+    def __init__(self, width, height, cost):
+        self.width = width
+        self.height = height
+        self.cost = cost
+        self.ids = []  # 1-based truck numbers of this type, in input order
+
+    @property
+    def count(self):
+        return len(self.ids)
+
+
+def group_trucks(trucks):
+    '''
+        Return the distinct truck types of a sequence of (W, H, C), in order of first appearance.
+    '''
+    types = {}
+    for j, (width, height, cost) in enumerate(trucks, start=1):
+        key = (width, height, cost)
+        if key not in types:
+            types[key] = TruckType(width, height, cost)
+        types[key].ids.append(j)
+    return list(types.values())
+
+
+def truck_copies(types, n_items):
+    '''
+        Return (truck number, W, H, C) for the trucks a model needs: the first
+        n_items trucks of every type.
+    '''
+    return [(j, t.width, t.height, t.cost) for t in types for j in t.ids[:n_items]]
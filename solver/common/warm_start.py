@@ -0,0 +1,67 @@
+'''
+    Warm start for the exact models: pack the instance with the heuristic first,
+    then give its packing to the solver as a hint and its cost as an upper bound,
+    so the solver starts from a feasible incumbent.
+'''
+import os
+import sys
+import time
+
+from ortools.sat.python import cp_model
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Heuristic', 'Complete Code'))
+from heuristic import Instance, solve
+
+# Share of the time limit of a solve that completing its hint may use
+HINT_SHARE = 0.2
+
+
+class WarmStart:
+    def __init__(self, cost, placements):
+        self.cost = cost
+        # placements[i] = (m, x, y, rotated): item i is in truck m (0-based) with its
+        # bottom-left corner at (x, y), rotated 90 degrees iff rotated = 1
+        self.placements = placements
+
+    @property
+    def used_trucks(self):
+        return {m for m, _, _, _ in self.placements}
+
+
+def heuristic_start(items, trucks):
+    '''
+        Return the heuristic packing of items (w, h) into trucks (W, H, C) as a WarmStart,
+        or None if some item fits no truck.
+        trucks should be the truck list of the model, e.g. its truck copies.
+    '''
+    solution = solve(Instance(items, trucks))
+    placements = []
+    for i, m, x, y, rotated in solution.placements():
+        if m == 0:
+            return None
+        w, h = items[i - 1]
+        # Rotating a square changes nothing; the models may not even allow it
+        placements.append((m - 1, x, y, rotated if w != h else 0))
+    return WarmStart(solution.total_cost, placements)
+
+
+def complete_hint(model, time_limit):
+    '''
+        Extend the hint of a CP-SAT model to every variable (direction literals,
+        right and top coordinates, ...) by solving with the hinted variables fixed,
+        so the solver takes the hint as its first solution right after presolve.
+        The hint is left as it is if no completion is found within time_limit seconds.
+        Return the time spent, to be taken off the time limit of the main solve.
+    '''
+    started = time.perf_counter()
+    solver = cp_model.CpSolver()
+    solver.parameters.fix_variables_to_their_hinted_value = True
+    solver.parameters.stop_after_first_solution = True
+    solver.parameters.max_time_in_seconds = time_limit
+    status = solver.Solve(model)
+    if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
+        solution = solver.ResponseProto().solution
+        model.ClearHints()
+        for index, value in enumerate(solution):
+            model.AddHint(model.GetIntVarFromProtoIndex(index), value)
+    return time.perf_counter() - started